@@ -0,0 +1,92 @@
+"""
+搜索广告关键词索引
+
+进程内维护 广告信息 uid -> 关键词集合 与 关键词 -> 广告信息 uid 集合
+关键词与搜索词同样归一化(article.search.normalize_query), 与搜索结果缓存一致
+
+ad_term_index.is_own('KOTjSsb5', 'Car') -> True
+ad_term_index.lookup('car') -> ['KOTjSsb5', ...]
+"""
+
+from collections import defaultdict
+
+from django.dispatch import receiver
+
+from utils.local_index import LocalIndex
+from article import models as article_models
+from article import signals as article_signals
+from article.search import normalize_query
+
+
+def parse_terms(terms):
+    """
+    逗号分隔的关键词, 忽略归一化后为空的关键词
+    """
+    return frozenset(filter(None, (normalize_query(term) for term in terms.split(','))))
+
+
+class AdTermIndex(LocalIndex):
+    tag = 'index:ad_terms'
+
+    def __init__(self):
+        super().__init__()
+        self.term_map = {}
+        self.uid_map = defaultdict(set)
+
+    def build(self):
+        term_map = {}
+        uid_map = defaultdict(set)
+        for uid, terms in article_models.SearchAdInfo.objects.values_list('uid', 'terms').iterator():
+            term_map[uid] = parse_terms(terms)
+            for term in term_map[uid]:
+                uid_map[term].add(uid)
+        with self.lock:
+            self.term_map = term_map
+            self.uid_map = uid_map
+
+    def _add(self, uid, terms):
+        self._remove(uid)
+        self.term_map[uid] = parse_terms(terms)
+        for term in self.term_map[uid]:
+            self.uid_map[term].add(uid)
+
+    def _remove(self, uid):
+        for term in self.term_map.pop(uid, ()):
+            self.uid_map[term].discard(uid)
+            if not self.uid_map[term]:
+                del self.uid_map[term]
+
+    def update(self, uids):
+        with self.lock:
+            if self.loaded:
+                terms_map = dict(article_models.SearchAdInfo.objects.filter(uid__in=uids).values_list('uid', 'terms'))
+                for uid in uids:
+                    if uid in terms_map:
+                        self._add(uid, terms_map[uid])
+                    else:
+                        self._remove(uid)
+        self.bump()
+
+    def is_own(self, uid, q):
+        """
+        搜索词是否为该广告信息的关键词
+        """
+        if not uid:
+            return False
+        self.ensure()
+        return normalize_query(q) in self.term_map.get(uid, ())
+
+    def lookup(self, term):
+        """
+        包含该关键词的广告信息 uid
+        """
+        self.ensure()
+        return sorted(self.uid_map.get(normalize_query(term), ()))
+
+
+ad_term_index = AdTermIndex()
+
+
+@receiver(article_signals.search_ad_infos_changed)
+def update_ad_term_index(sender, uids, **kwargs):
+    ad_term_index.update(uids)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class GameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'article'
+
+    def ready(self):
+        # 注册信号接收
+        from article import search, suggest, sampler, discussion, ad_terms, receivers  # noqa
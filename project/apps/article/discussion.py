@@ -0,0 +1,46 @@
+"""
+讨论页推荐文章
+
+进程内缓存 DiscussionLink, 构建时将文章 slug 解析为 uid, 找不到文章的链接不参与推荐
+discussion_links.sample(5, exclude='KOTjSsb5') -> [('8D3UYUH6', 'article uid'), ...]
+"""
+
+import random
+
+from django.dispatch import receiver
+
+from utils.local_index import LocalIndex
+from article import models as article_models
+from article import signals as article_signals
+
+
+class DiscussionLinks(LocalIndex):
+    tag = 'index:discussion'
+
+    def __init__(self):
+        super().__init__()
+        self.link_list = []
+
+    def build(self):
+        link_rows = list(article_models.DiscussionLink.objects.order_by('id').values_list('sai_id', 'article_slug'))
+        uid_map = dict(article_models.Article.objects.filter(
+            slug__in={article_slug for _, article_slug in link_rows}).values_list('slug', 'uid'))
+        self.link_list = [(sai_id, uid_map[article_slug]) for sai_id, article_slug in link_rows
+                          if article_slug in uid_map]
+
+    def sample(self, k, exclude=None):
+        """
+        随机抽取 k 个链接, 返回 (广告信息 uid, 文章 uid)
+        """
+        self.ensure()
+        link_list = [link for link in self.link_list if link[0] != exclude]
+        return random.sample(link_list, min(k, len(link_list)))
+
+
+discussion_links = DiscussionLinks()
+
+
+@receiver(article_signals.articles_changed)
+def reset_discussion_links(sender, uids, **kwargs):
+    # 文章 slug 可能变化, 各进程在后台重建
+    discussion_links.invalidate()
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.3 on 2026-10-18 10:00
+
+from django.db import migrations, models
+
+
+def fill_keywords(apps, schema_editor):
+    Article = apps.get_model('article', 'Article')
+    for article in Article.objects.prefetch_related('tags', 'categories').only('uid').iterator(chunk_size=500):
+        names = [tag.name for tag in article.tags.all()] + [category.name for category in article.categories.all()]
+        Article.objects.filter(uid=article.uid).update(keywords=' '.join(names)[:1000])
+
+
+def add_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute('ALTER TABLE article_article ADD FULLTEXT INDEX article_title_ft (title)')
+    schema_editor.execute(
+        'ALTER TABLE article_article ADD FULLTEXT INDEX article_search_ft (title, description, keywords)')
+
+
+def remove_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute('ALTER TABLE article_article DROP INDEX article_title_ft')
+    schema_editor.execute('ALTER TABLE article_article DROP INDEX article_search_ft')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0005_article_referrer_ad_creative'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='keywords',
+            field=models.CharField(default='', max_length=1000),
+        ),
+        migrations.RunPython(fill_keywords, migrations.RunPython.noop),
+        migrations.RunPython(add_fulltext_index, remove_fulltext_index),
+    ]
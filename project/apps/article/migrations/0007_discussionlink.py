@@ -0,0 +1,149 @@
+# Generated by Django 4.2.3 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+# 原 DiscussionPageView 中的 ad_article_map
+INITIAL_LINKS = (
+    ('KOTjSsb5', 'junk-cars-a-journey-of-value-and-opportunity'),
+    ('8D3UYUH6', 'roll-with-confidence-a-journey-through-tire-services'),
+    ('SAobOEx9', 'a-comprehensive-guide-to-donating-cars-for-kids'),
+    ('DbAnebTS', 'shield-and-shade-unveiling-the-magic-of-window-tinting'),
+    ('EgAJKXiu', 'experience-premium-pay-less-navigate-the-economical-oil-change-services'),
+    ('16rqaqX9', 'in-line-the-relevance-of-expert-car-alignment-services-nearby'),
+    ('iP5DtYjZ', 'glass-repairs-safeguarding-your-rides-panoramic-perspective'),
+    ('7LvDpCCc', 'fueling-financial-success-the-rise-of-online-vehicle-marketplaces'),
+    ('packGtF0', 'roadways-to-revenue-harnessing-the-power-of-online-vehicle-sale'),
+    ('sh8Q0kpB', 'unlocking-the-value-of-selling-your-car-online'),
+    ('hipmvlj3', 'empower-your-journey-discover-the-world-of-tire-services'),
+    ('OMtySHpI', 'discover-the-excitement-in-driving-with-the-2024-mazda-cx-50'),
+    ('Dd4qpaXC', 'rolling-into-the-future-the-electric-scooter-revolution'),
+    ('2b1iKILs', 'cash-on-wheels-steering-towards-a-sustainable-future-with-car-trade-ins'),
+    ('f2YdY2FU', 'driving-clean-the-journey-of-auto-detailing-excellence'),
+    ('EFdffjl2', 'steering-to-the-future-decoding-the-power-of-local-vehicle-repair-services'),
+    ('Njq4PZpm', 'navigating-the-wheels-a-guide-to-frugal-automotive-choices-in-2024'),
+    ('aiZ4YiZc', 'transforming-old-iron-into-gold'),
+    ('acNUsyby', 'revving-up-profits-unravel-the-world-of-cash-for-car-transactions'),
+    ('Pg0AjMCV', 'discover-your-dream-drive-luxury-innovation-and-convenience-at-your-fingertips'),
+    ('JieOpmrR', 'journey-with-trusted-allies-your-local-automotive-caregivers'),
+    ('jt8ymClB', 'a-sound-brake-check-can-break-your-worries'),
+    ('3Z52KUhp', 'ignite-change-with-your-car-donation'),
+    ('8LygZmFD', 'the-lifeblood-of-your-ride-exploring-the-importance-of-oil-changes'),
+    ('S2j2RWzA', 'unearth-the-unexpected-from-the-unwanted-the-art-of-selling-non-functioning-automobiles'),
+    ('WtqWLWuU', 'veterans-car-charity-compare-car-donation-charities'),
+    ('Xa3iXR39', 'decoding-the-basics-of-car-warranty-understanding-coverage-and-benefits'),
+    ('Bxo3Z9cM', 'a-closer-look-at-extended-car-warranties-drive-with-confidence'),
+    ('E21zPbvX', 'hit-the-jackpot-turn-your-vehicle-into-valuable-profit'),
+    ('5oG6Jg0e', 'how-donating-your-car-can-support-veteransdonations'),
+    ('GQdCufwO', 'virtual-vision-embrace-the-future-of-business-operations'),
+    ('ztgD5OJO', 'wired-in-unveiling-the-power-of-local-electrician-servicesservices'),
+    ('D8KuUEsN', 'transparency-unveiled-a-journey-through-the-looking-glass'),
+    ('QBlb7h7x', 'revitalize-your-abode-the-wonders-of-replacement-services'),
+    ('e5TLth3J', 'home-services-on-demand-finding-quality-near-you'),
+    ('pcMCXNAc', 'warmth-in-every-sip-celebrating-the-bliss-of-custom-and-personalized-mugs'),
+    ('gfpacZYY', 'the-power-of-posture-enhancing-workspaces-with-innovative-desks'),
+    ('WlejltNA', 'restoring-harmony-the-art-and-efficiency-of-home-and-auto-maintenance'),
+    ('3fJLvurF', 'guarding-the-canopy-the-case-for-leaf-guard-gutters'),
+    ('iu2dJxTJ', 'the-modern-gold-rush-understanding-ways-to-earn-money-in-todays-digital-era'),
+    ('Jf7d4QBz', 'navigating-comfort-an-insight-into-the-world-of-hvac-services'),
+    ('Y2fqF672', 'gateway-to-robustness-unraveling-the-criticality-of-garage-door-repairs-and-services'),
+    ('Z3xXK8Jq', 'unseen-heroes-exploring-the-world-of-septic-services'),
+    ('ZLA7uNHr', 'the-golden-trail-unraveling-the-path-to-precious-investments'),
+    ('9bMA1960', 'matrix-of-mobility-unraveling-the-world-of-qr-code-generation'),
+    ('aw7FHD8t', 'fulfilling-daily-duties-essential-services-for-your-perfect-home'),
+    ('RY8Hp3se', 'unraveling-comfort-the-art-and-utility-of-rugs-in-your-living-spaces'),
+    ('KQNO7QBU', 'the-essentials-of-modern-living-unveiling-best-in-class-products-and-services'),
+    ('wWwg9mjd', 'machines-of-marvel-enhancing-everyday-experience'),
+    ('cDBI60uC', 'footprints-of-excellence-the-art-and-craft-of-modern-flooring-solutions'),
+    ('VcLNxuiB', 'unlocking-secrets-of-security-a-closer-look-at-locksmith-services'),
+    ('j1P64Km8', 'the-assurance-of-reliable-plumbing-services-round-the-clock'),
+    ('JQbIKl3L', 'in-hot-water-demystifying-the-world-of-water-heater-services'),
+    ('8dXJ8Q6F', 'fluid-dynamics-at-work-proficient-plumbers-safeguarding-your-domestic-bliss'),
+    ('d4hMItMq', 'unlock-home-comforts-expert-maintenance-repair-and-installation-just-a-call-away'),
+    ('s1HLw8QN', 'tailoring-creativity-the-art-of-customized-essentials'),
+    ('10MhPaHr', 'impressions-in-a-glance-the-power-of-logos-in-building-brands'),
+    ('wj1a2wye', 'fanning-the-flames-a-comprehensive-guide-to-furnace-maintenance-and-repair'),
+    ('mG57PQa3', 'unleashing-digital-power-the-transformative-journey-in-digital-marketing'),
+    ('5GTZXpfS', 'swiping-success-amplifying-business-with-seamless-credit-card-processing'),
+    ('eBOGAMXG', 'impressions-beyond-pixels-understanding-the-power-of-professional-printing-services'),
+    ('FwmKNYDc', 'essential-comforts-the-foundation-of-home-repair-services'),
+    ('FNQFRI6t', 'under-the-shield-celebrating-the-craft-of-roofing-professionals'),
+    ('SVsnKfXX', 'streamlining-success-one-payroll-at-a-time'),
+    ('8PpxLuhc', 'illuminating-the-payroll-pathway-for-success'),
+    ('4YppiSDq', 'empower-your-abode-office-with-security-and-efficacy'),
+    ('a8KHrW6d', 'under-the-shelter-of-security-exploring-the-world-of-roofing-services'),
+    ('uMQJU39V', 'shielding-your-sanctuary-a-dive-into-the-realm-of-home-security-solutions'),
+    ('xMq8c9DL', 'home-sweet-home-unleashing-the-power-of-local-services-for-a-comfortable-lifestyle'),
+    ('yS1noXQR', 'embracing-ease-exploring-the-benefits-of-walk-in-tubs-and-showers'),
+    ('BSWS39cL', 'embrace-the-future-navigating-the-digital-landscape'),
+    ('lKZTpnnA', 'diving-into-the-digital-unboxing-the-power-of-online-advertising'),
+    ('bRNLaNab', 'crowning-glory-exploring-the-multifaceted-world-of-roofing-services'),
+    ('3vygSwG6', 'cozy-comfort-under-your-feet-the-intricacies-of-the-carpet-industry'),
+    ('LAqZWVAH', 'chronicles-of-time-unfolding-stories-with-calendars'),
+    ('9XKcvI4r', 'checks-and-balances-navigating-the-world-of-modern-verification'),
+    ('KLzbBLcJ', 'ceramic-chronicles-a-journey-through-the-world-of-tiles'),
+    ('0C0d61kx', 'a-portal-to-panorama-elevating-your-space-with-window-and-door-solutions'),
+    ('VcUXPpQ7', 'ignite-change-with-your-car-donation-2'),
+    ('JAVXWD9B', 'american-homeowners-the-secrets-to-cost-effective-roofing'),
+    ('lQRVWrgb', 'killer-new-palisade-suv-attracts-every-customer'),
+    ('gov0QIh0', 'ultimate-comfort-suvs-for-elderly-indulge-in-the-comforts-of-a-luxury-suv'),
+    ('MQidl2oc', 'understanding-car-insurance'),
+    ('z6TH0ClG', 'hybrid-suv-an-eco-friendly-and-efficient-choice'),
+    ('oDzp7nne', 'economical-choices-for-seniors-buying-a-toyota-highlander'),
+    ('8RP8PZN0', 'senior-friendly-strategies-to-secure-a-budget-friendly-kona'),
+    ('O2SIrRBO', 'seniors-guide-to-buying-a-hyundai-ioniq-ev-on-a-budget'),
+    ('wpiTIfED', 'unsold-suvs-with-zero-miles-could-be-cheap-for-seniors'),
+    ('ZJNKvuQa', 'a-guide-for-seniors-on-purchasing-a-reasonably-priced-ram-1500'),
+    ('AuQ6ndTu', 'the-seniors-guide-to-buying-a-buick-on-a-budget'),
+    ('FVQYuboh', 'les-voitures-invendues-sont-vendues-pour-presque-rien'),
+    ('cDHyeUH8', 'killer-new-palisade-suv-attracts-every-customer'),
+    ('mFnJqI4F', 'a-guide-for-seniors-on-purchasing-a-reasonably-priced-ram-1500-2'),
+    ('8y4pk3KT', 'used-suvs-cars-2023-sales-affordable-prices-cant-be-missed'),
+    ('TLIwQXdp', 'new-small-hyundai-kona-for-seniors-the-price-might-surprise-you'),
+    ('N5xzx7xx', 'how-seniors-can-get-toyota-rav4s-on-a-budget-practical-buying-tips'),
+    ('oSbxqYq7', 'unsold-cars-for-seniors-are-almost-being-given-away'),
+    ('uh8lrqvx', 'best-suv-buy-deals-new-leftover-suvs-are-nearly-being-given-away'),
+    ('wPThKqEo', 'discover-the-new-volvo-in-2025-setting-trends-for-the-future'),
+    ('cTVNqAcP', 'exploring-the-unmatched-appeal-of-the-new-jeep-grand-cherokee'),
+    ('is8Dp4f6', 'oil-change-coupons-for-seniors'),
+    ('LT4WPS9o', 'oil-change-coupons-your-ultimate-guide'),
+    ('vwi1SJ8S', 'killer-new-palisade-suv-attracts-every-customer-2'),
+    ('djuMhcPB', 'killer-new-hyundai-santafe-2024-in-hong-kong'),
+    ('Ooun0A2z', 'les-voitures-invendues-sont-vendues-pour-presque-rien-2'),
+    ('QNIxsYn9', 'understanding-car-insurance-2'),
+    ('S7ocqhtJ', 'the-killer-new-mazda-cx-30-is-close-to-perfection'),
+    ('JEdB7GA1', 'new-ram-1500-clearance-sale-prices-might-surprise-you'),
+    ('MQHBzlNV', 'how-to-buy-a-reliable-used-car-on-a-budget'),
+    ('NoTwxhJR', 'killer-new-palisade-suv-attracts-every-custome'),
+    ('b0TvVR9E', 'unsold-cars-for-seniors-are-almost-being-given-away-2'),
+)
+
+
+def add_initial_links(apps, schema_editor):
+    DiscussionLink = apps.get_model('article', 'DiscussionLink')
+    DiscussionLink.objects.bulk_create(
+        [DiscussionLink(sai_id=sai_id, article_slug=article_slug) for sai_id, article_slug in INITIAL_LINKS],
+        ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article', '0006_article_keywords'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiscussionLink',
+            fields=[
+                ('create_time', models.DateTimeField(auto_now_add=True)),
+                ('update_time', models.DateTimeField(auto_now=True)),
+                ('id', models.BigAutoField(db_index=True, primary_key=True, serialize=False)),
+                ('sai_id', models.CharField(max_length=10, unique=True)),
+                ('article_slug', models.SlugField(max_length=250)),
+            ],
+            options={
+                'db_table': 'article_discussion_link',
+            },
+        ),
+        migrations.RunPython(add_initial_links, migrations.RunPython.noop),
+    ]
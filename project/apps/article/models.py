@@ -15,6 +15,8 @@ class Article(TimeBaseModel):
     content = models.TextField(max_length=50000, default='')
     cover_img = models.CharField(max_length=200, default='')
     rank = models.PositiveIntegerField(default=99999)
+    # 标签与分类名, 供全文检索使用, 见 article.search
+    keywords = models.CharField(max_length=1000, default='')
     tags = models.ManyToManyField('article.Tag', related_name='articles', db_constraint=False)
     categories = models.ManyToManyField('article.Category', related_name='articles', db_constraint=False)
 
@@ -71,3 +73,16 @@ class SearchAdInfo(TimeBaseModel):
     class Meta:
         app_label = 'article'
         db_table = 'article_search_ad_info'
+
+
+class DiscussionLink(TimeBaseModel):
+    """
+    讨论页推荐文章: 搜索广告信息 uid -> 文章 slug
+    """
+    id = models.BigAutoField(primary_key=True, db_index=True)
+    sai_id = models.CharField(max_length=10, unique=True)
+    article_slug = models.SlugField(max_length=250)
+
+    class Meta:
+        app_label = 'article'
+        db_table = 'article_discussion_link'
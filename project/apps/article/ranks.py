@@ -0,0 +1,47 @@
+"""
+分类排行
+
+进程内缓存全部 CategoryGroupRank, 页面与数据接口共用, 不再逐次查询
+category_ranks.get('repair') -> ['uid1', 'uid2', ...]
+"""
+
+from utils.local_index import LocalIndex
+from article import models as article_models
+
+
+def normalize_rank(rank):
+    """
+    去重并保持顺序, 与 Case/When 取首次出现的位置一致
+    """
+    return tuple(dict.fromkeys(rank or ()))
+
+
+class CategoryRanks(LocalIndex):
+    tag = 'index:rank'
+
+    def __init__(self):
+        super().__init__()
+        self.rank_map = {}
+
+    def build(self):
+        self.rank_map = {
+            slug: normalize_rank(rank)
+            for slug, rank in article_models.CategoryGroupRank.objects.values_list('slug', 'rank')
+        }
+
+    def update(self, slug):
+        """
+        排行已修改, 重新读取该分类
+        """
+        with self.lock:
+            if self.loaded:
+                rank = article_models.CategoryGroupRank.objects.filter(slug=slug).values_list('rank', flat=True).first()
+                self.rank_map[slug] = normalize_rank(rank)
+        self.bump()
+
+    def get(self, slug):
+        self.ensure()
+        return list(self.rank_map.get(slug, ()))
+
+
+category_ranks = CategoryRanks()
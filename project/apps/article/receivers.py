@@ -0,0 +1,27 @@
+"""
+文章信号接收
+"""
+
+from django.dispatch import receiver
+
+from utils import cache as cache_utils
+from article import models as article_models
+from article import signals as article_signals
+
+
+@receiver(article_signals.articles_changed)
+def invalidate_article_caches(sender, uids, category_ids=(), **kwargs):
+    """
+    文章变更后使依赖该文章、所属分类及全部文章的缓存失效
+    """
+    category_slugs = set(article_models.Category.objects.filter(articles__uid__in=uids).values_list('slug', flat=True))
+    if category_ids:
+        category_slugs.update(article_models.Category.objects.filter(id__in=category_ids).values_list('slug', flat=True))
+    cache_utils.bump('article', *uids)
+    cache_utils.bump('category', *category_slugs)
+    cache_utils.bump('catalog')
+
+
+@receiver(article_signals.search_ad_infos_changed)
+def invalidate_search_ad_info_caches(sender, uids, **kwargs):
+    cache_utils.bump('ad', *uids)
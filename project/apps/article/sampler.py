@@ -0,0 +1,90 @@
+"""
+文章随机抽样
+
+进程内维护全部文章 uid 池, 替代 order_by('?')
+article_sampler.sample(10, exclude=[uid]) -> ['uid1', 'uid2', ...]
+"""
+
+import random
+
+from django.dispatch import receiver
+
+from utils.local_index import LocalIndex
+from article import models as article_models
+from article import signals as article_signals
+
+
+class ArticleSampler(LocalIndex):
+    tag = 'index:sampler'
+    # 随机抽样, 不要求包含最新文章, 已删除的文章查询时会被过滤
+    observed = False
+
+    def __init__(self):
+        super().__init__()
+        self.uid_list = []
+        self.uid_index = {}
+
+    def build(self):
+        uid_list = list(article_models.Article.objects.values_list('uid', flat=True))
+        uid_index = {uid: index for index, uid in enumerate(uid_list)}
+        with self.lock:
+            self.uid_list = uid_list
+            self.uid_index = uid_index
+
+    def _add(self, uid):
+        if uid in self.uid_index:
+            return
+        self.uid_index[uid] = len(self.uid_list)
+        self.uid_list.append(uid)
+
+    def _remove(self, uid):
+        index = self.uid_index.pop(uid, None)
+        if index is None:
+            return
+        # 与末尾元素交换后弹出
+        last_uid = self.uid_list.pop()
+        if last_uid != uid:
+            self.uid_list[index] = last_uid
+            self.uid_index[last_uid] = index
+
+    def update(self, uids):
+        with self.lock:
+            if self.loaded:
+                existing = set(article_models.Article.objects.filter(uid__in=uids).values_list('uid', flat=True))
+                for uid in uids:
+                    if uid in existing:
+                        self._add(uid)
+                    else:
+                        self._remove(uid)
+        self.bump()
+
+    def sample(self, k, exclude=()):
+        """
+        随机抽取 k 个不重复的 uid, 期望 O(k)
+        """
+        self.ensure()
+        exclude = set(exclude)
+        with self.lock:
+            available = len(self.uid_list) - sum(1 for uid in exclude if uid in self.uid_index)
+            if k >= available:
+                uid_list = [uid for uid in self.uid_list if uid not in exclude]
+                random.shuffle(uid_list)
+                return uid_list
+
+            chosen = []
+            seen = set(exclude)
+            while len(chosen) < k:
+                uid = self.uid_list[random.randrange(len(self.uid_list))]
+                if uid in seen:
+                    continue
+                seen.add(uid)
+                chosen.append(uid)
+            return chosen
+
+
+article_sampler = ArticleSampler()
+
+
+@receiver(article_signals.articles_changed)
+def update_article_sampler(sender, uids, **kwargs):
+    article_sampler.update(uids)
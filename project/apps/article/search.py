@@ -0,0 +1,279 @@
+"""
+文章全文检索
+
+倒排索引覆盖 title / description / keywords(标签与分类名), 按 BM25 相关度排序
+- MySQLSearchBackend: 生产环境, 使用 MySQL FULLTEXT 索引
+- MemorySearchBackend: 测试与 SQLite, 进程内倒排索引
+
+search_backend.search('car donation') -> ['uid1', 'uid2', ...]
+
+search_article_uids 按归一化后的检索词缓存排序结果, 文章变更(catalog)或进程内索引更新后失效, 各页各尺寸共用
+
+与旧实现的区别(/page/q 与 /data/q):
+- 旧实现返回全部文章, 标题包含检索词的在前, 描述包含的其次, 其余文章排在最后
+- 现在只返回匹配的文章, 按相关度排序, 最多 SEARCH_MAX_RESULTS 条, count 为匹配数
+- q 为空时仍返回全部文章
+"""
+
+import re
+import math
+import time
+import hashlib
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from utils.cache import version_key, observe, collect_dependencies, get_stable_versions
+from utils.local_index import LocalIndex
+from article import models as article_models
+from article import signals as article_signals
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+STOP_WORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is', 'it', 'of', 'on', 'or', 'that',
+    'the', 'to', 'with', 'your', 'you',
+))
+
+
+def stem(token):
+    """
+    简单词干: 去掉英文复数后缀
+    """
+    if len(token) > 4 and token.endswith('ies'):
+        return token[:-3] + 'y'
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text, stemming=True):
+    """
+    分词: 小写, 按单词切分, 去停用词
+    """
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOP_WORDS:
+            continue
+        tokens.append(stem(token) if stemming else token)
+    return tokens
+
+
+def build_keywords(tag_names, category_names):
+    """
+    标签与分类名拼接为 keywords 字段
+    """
+    return ' '.join([*tag_names, *category_names])[:1000]
+
+
+def sync_keywords(uids):
+    """
+    根据标签与分类重算文章的 keywords 字段
+    """
+    names = defaultdict(lambda: ([], []))
+    tag_rows = article_models.Article.tags.through.objects.filter(
+        article_id__in=uids).values_list('article_id', 'tag__name')
+    for article_id, name in tag_rows:
+        names[article_id][0].append(name)
+    category_rows = article_models.Article.categories.through.objects.filter(
+        article_id__in=uids).values_list('article_id', 'category__name')
+    for article_id, name in category_rows:
+        names[article_id][1].append(name)
+
+    article_list = [
+        article_models.Article(uid=uid, keywords=build_keywords(*names[uid]))
+        for uid in article_models.Article.objects.filter(uid__in=uids).values_list('uid', flat=True)
+    ]
+    article_models.Article.objects.bulk_update(article_list, ['keywords'], batch_size=500)
+
+
+class BaseSearchBackend:
+    # 检索结果依赖的进程内索引, 见 utils.local_index
+    tag = None
+
+    def search(self, q):
+        """
+        返回按相关度排序的文章 uid 列表
+        """
+        raise NotImplementedError
+
+    def update(self, uids):
+        """
+        文章写入/删除后更新索引
+        """
+        pass
+
+
+class MySQLSearchBackend(BaseSearchBackend):
+    """
+    MySQL FULLTEXT 索引, 见 migrations/0006
+    title 单独建索引用于加权
+    """
+
+    def search(self, q):
+        terms = tokenize(q, stemming=False)
+        if not terms:
+            return []
+        query = ' '.join(terms)
+        score = RawSQL(
+            'MATCH (title) AGAINST (%s IN NATURAL LANGUAGE MODE) * 2 + '
+            'MATCH (title, description, keywords) AGAINST (%s IN NATURAL LANGUAGE MODE)',
+            (query, query)
+        )
+        uid_list = article_models.Article.objects.annotate(score=score).filter(score__gt=0).order_by(
+            '-score', 'uid').values_list('uid', flat=True)
+        return list(uid_list[:settings.SEARCH_MAX_RESULTS])
+
+
+class MemorySearchBackend(LocalIndex, BaseSearchBackend):
+    """
+    进程内倒排索引, BM25 相关度
+    """
+    tag = 'index:search'
+    # 字段权重
+    field_weights = (('title', 3), ('keywords', 2), ('description', 1))
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        super().__init__()
+        self.postings = {}
+        self.doc_terms = {}
+        self.doc_len = {}
+        self.total_len = 0
+
+    def build(self):
+        postings = defaultdict(dict)
+        doc_terms = {}
+        for row in article_models.Article.objects.values('uid', *[name for name, _ in self.field_weights]).iterator():
+            terms = self._get_terms(row)
+            for term, tf in terms.items():
+                postings[term][row['uid']] = tf
+            doc_terms[row['uid']] = terms
+        doc_len = {uid: sum(terms.values()) for uid, terms in doc_terms.items()}
+        with self.lock:
+            self.postings = postings
+            self.doc_terms = doc_terms
+            self.doc_len = doc_len
+            self.total_len = sum(doc_len.values())
+
+    def _get_terms(self, row):
+        terms = Counter()
+        for name, weight in self.field_weights:
+            for token in tokenize(row[name]):
+                terms[token] += weight
+        return terms
+
+    def _add(self, row):
+        terms = self._get_terms(row)
+        uid = row['uid']
+        for term, tf in terms.items():
+            self.postings[term][uid] = tf
+        self.doc_terms[uid] = terms
+        self.doc_len[uid] = sum(terms.values())
+        self.total_len += self.doc_len[uid]
+
+    def _remove(self, uid):
+        terms = self.doc_terms.pop(uid, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self.postings[term]
+            posting.pop(uid, None)
+            if not posting:
+                del self.postings[term]
+        self.total_len -= self.doc_len.pop(uid)
+
+    def update(self, uids):
+        with self.lock:
+            if self.loaded:
+                for uid in uids:
+                    self._remove(uid)
+                rows = article_models.Article.objects.filter(uid__in=uids).values(
+                    'uid', *[name for name, _ in self.field_weights])
+                for row in rows:
+                    self._add(row)
+        self.bump()
+
+    def search(self, q):
+        terms = set(tokenize(q))
+        if not terms:
+            return []
+        self.ensure()
+        with self.lock:
+            doc_count = len(self.doc_len)
+            if not doc_count:
+                return []
+            avg_len = self.total_len / doc_count
+            scores = defaultdict(float)
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                idf = math.log(1 + (doc_count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for uid, tf in posting.items():
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_len[uid] / avg_len)
+                    scores[uid] += idf * tf * (self.k1 + 1) / (tf + norm)
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return [uid for uid, _ in ranked[:settings.SEARCH_MAX_RESULTS]]
+
+
+def get_search_backend():
+    """
+    SEARCH_BACKEND 未配置时按数据库类型选择
+    """
+    if settings.SEARCH_BACKEND:
+        return import_string(settings.SEARCH_BACKEND)()
+    if connection.vendor == 'mysql':
+        return MySQLSearchBackend()
+    return MemorySearchBackend()
+
+
+search_backend = get_search_backend()
+
+
+def normalize_query(q):
+    """
+    大小写、空白与标点不影响检索结果, 'Car' / ' car' / 'CAR' 归一为 'car'
+    """
+    return ' '.join(TOKEN_RE.findall(q.lower()))
+
+
+def search_article_uids(q):
+    """
+    搜索文章, 归一化后为空(未传 q 或只有标点)时返回全部文章
+    """
+    query = normalize_query(q)
+    if not query:
+        return article_models.Article.objects.order_by('-update_time').values_list('uid', flat=True)
+
+    key = f'backend:search:result:{hashlib.md5(query.encode()).hexdigest()}'
+    version_keys = {tag: version_key(tag) for tag in ('catalog', search_backend.tag) if tag}
+    values = cache.get_many([key, *version_keys.values()])
+    versions = {tag: values.get(key_, 0) for tag, key_ in version_keys.items()}
+    entry = values.get(key)
+    if entry is not None and all(versions.get(tag) == version for tag, version in entry['versions'].items()):
+        # 外层缓存视图同样依赖这些版本
+        for tag, version in entry['versions'].items():
+            observe(tag, version)
+        return entry['uid_list']
+
+    started_at = time.time()
+    with collect_dependencies({'catalog': versions['catalog']}) as dependencies:
+        uid_list = search_backend.search(query)
+    # 本进程索引落后或检索期间文章变更时不缓存
+    versions = get_stable_versions(dependencies, started_at)
+    if versions is not None:
+        cache.set(key, {'versions': versions, 'uid_list': uid_list}, int(settings.CACHE_TIME_Q))
+    return uid_list
+
+
+@receiver(article_signals.articles_changed)
+def update_search_index(sender, uids, **kwargs):
+    sync_keywords(uids)
+    search_backend.update(uids)
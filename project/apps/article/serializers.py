@@ -1,8 +1,13 @@
-import random
+import time
+import zlib
+from django.db import models
+from django.db.models import prefetch_related_objects
 from rest_framework import serializers
+from utils.cache import depend_on
 from utils.imgproxy import imgproxy, ImgProxyOptions
+from utils.metrics import serializer_timer
+from utils.fragments import get_representations
 from article import models as article_models
-from datetime import datetime, timezone
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -27,6 +32,80 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
+class ArticleListSerializer(serializers.ListSerializer):
+    """
+    列表序列化
+    按子序列化器 Meta.prefetch_fields 批量预取关联数据, 避免逐行查询
+    并将列表中的文章记为当前缓存的依赖
+    每篇文章的序列化结果单独缓存(见 utils.fragments.get_representations), 只处理未命中的文章
+    """
+
+    def to_representation(self, data):
+        # 文章查询前的时间, 已查询出的列表由调用方通过 context['loaded_at'] 传入
+        loaded_at = self.context.get('loaded_at')
+        if isinstance(data, (models.manager.BaseManager, models.QuerySet)):
+            loaded_at = time.time()
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        article_list = list(iterable)
+        depend_on('article', *[article.uid for article in article_list])
+        variant = self.child.get_cover_img_options().name if isinstance(self.child, CoverImgMixin) else ''
+        return get_representations(self.child, article_list, 'article', self.serialize_many, variant=variant,
+                                   loaded_at=loaded_at)
+
+    def serialize_many(self, article_list):
+        prefetch_fields = getattr(self.child.Meta, 'prefetch_fields', ())
+        if prefetch_fields:
+            prefetch_related_objects(article_list, *prefetch_fields)
+        with serializer_timer():
+            if not isinstance(self.child, CoverImgMixin):
+                return super().to_representation(article_list)
+            # 整页封面图一次签名, 逐条序列化时直接取用
+            self.child.cover_img_urls = imgproxy.get_img_urls([article.cover_img for article in article_list],
+                                                              options=self.child.get_cover_img_options())
+            try:
+                return super().to_representation(article_list)
+            finally:
+                self.child.cover_img_urls = {}
+
+
+class CoverImgMixin:
+    """
+    封面图地址, cover_img_options 为默认尺寸
+    """
+    cover_img_options = ImgProxyOptions.COVER_IMG
+    # 列表序列化时批量签名的封面图地址 {cover_img: url}, 见 ArticleListSerializer.serialize_many
+    cover_img_urls = {}
+
+    def get_cover_img_options(self):
+        return self.context.get('options', self.cover_img_options)
+
+    def get_cover_img(self, obj):
+        url = self.cover_img_urls.get(obj.cover_img)
+        if url is None:
+            url = imgproxy.get_img_url(obj.cover_img, options=self.get_cover_img_options())
+        return url
+
+
+class PrimaryCategoryMixin:
+    """
+    文章主分类: id 最小的分类, 与 categories.first() 一致
+    categories 已预取时不产生查询
+    """
+
+    def get_category(self, obj):
+        category_obj = min(obj.categories.all(), key=lambda category: category.pk, default=None)
+        return CategorySerializer(category_obj).data
+
+
+class ReadTimeMixin:
+    """
+    阅读时间(分钟), 3~8 之间按 uid 固定, 同一文章每次响应一致
+    """
+
+    def get_read_time(self, obj):
+        return zlib.crc32(obj.uid.encode()) % 6 + 3
+
+
 class SearchAdInfoSerializer(serializers.ModelSerializer):
     class Meta:
         model = article_models.SearchAdInfo
@@ -39,19 +118,11 @@ class SearchArticleSerializer(serializers.ModelSerializer):
         fields = ("uid", "title", "description", "content", "cover_img", "referrer_ad_creative")
 
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleSerializer(CoverImgMixin, PrimaryCategoryMixin, serializers.ModelSerializer):
     cover_img = serializers.SerializerMethodField()
     category = serializers.SerializerMethodField(read_only=True)
     tags = serializers.SerializerMethodField(read_only=True)
 
-    def get_cover_img(self, obj):
-        options = self.context.get('options', ImgProxyOptions.COVER_IMG)
-        return imgproxy.get_img_url(obj.cover_img, options=options)
-
-    def get_category(self, obj):
-        category_obj = obj.categories.first()
-        return CategorySerializer(category_obj).data
-
     def get_tags(self, obj):
         tag_list = obj.tags.all()
         if tag_list:
@@ -62,117 +133,72 @@ class ArticleSerializer(serializers.ModelSerializer):
         model = article_models.Article
         fields = (
             "uid", "title", "description", 'tags', "category", "content", "cover_img", "rank", "referrer_ad_creative")
+        list_serializer_class = ArticleListSerializer
+        prefetch_fields = ('tags', 'categories')
 
 
-class IndexArticleSerializer(serializers.ModelSerializer):
+class IndexArticleSerializer(CoverImgMixin, PrimaryCategoryMixin, serializers.ModelSerializer):
     cover_img = serializers.SerializerMethodField()
     category = serializers.SerializerMethodField(read_only=True)
 
-    def get_cover_img(self, obj):
-        options = self.context.get('options', ImgProxyOptions.M_COVER_IMG)
-        return imgproxy.get_img_url(obj.cover_img, options=options)
-
-    def get_category(self, obj):
-        category_obj = obj.categories.first()
-        return CategorySerializer(category_obj).data
+    cover_img_options = ImgProxyOptions.M_COVER_IMG
 
     class Meta:
         model = article_models.Article
         fields = ("uid", "title", "description", "update_time", "category", "cover_img", "rank")
+        list_serializer_class = ArticleListSerializer
+        prefetch_fields = ('categories',)
 
 
-class CategoryArticleSerializer(serializers.ModelSerializer):
+class CategoryArticleSerializer(CoverImgMixin, PrimaryCategoryMixin, ReadTimeMixin, serializers.ModelSerializer):
     cover_img = serializers.SerializerMethodField()
     category = serializers.SerializerMethodField(read_only=True)
     read_time = serializers.SerializerMethodField()
 
-    def get_read_time(self, obj):
-        return random.randint(3, 8)
-
-    def get_cover_img(self, obj):
-        options = self.context.get('options', ImgProxyOptions.M_COVER_IMG)
-        return imgproxy.get_img_url(obj.cover_img, options=options)
-
-    def get_category(self, obj):
-        category_obj = obj.categories.first()
-        return CategorySerializer(category_obj).data
+    cover_img_options = ImgProxyOptions.M_COVER_IMG
 
     class Meta:
         model = article_models.Article
         fields = ("uid", "title", "description", "update_time", "category", "cover_img", "rank", 'read_time')
+        list_serializer_class = ArticleListSerializer
+        prefetch_fields = ('categories',)
 
 
-class ArticleDetailSerializer(serializers.ModelSerializer):
+class ArticleDetailSerializer(CoverImgMixin, ReadTimeMixin, serializers.ModelSerializer):
     cover_img = serializers.SerializerMethodField()
 
     read_time = serializers.SerializerMethodField()
 
-    def get_read_time(self, obj):
-        return random.randint(3, 8)
-
-    def get_cover_img(self, obj):
-        options = self.context.get('options', ImgProxyOptions.L_COVER_IMG)
-        return imgproxy.get_img_url(obj.cover_img, options=options)
+    cover_img_options = ImgProxyOptions.L_COVER_IMG
 
     class Meta:
         model = article_models.Article
         fields = ("uid", "title", "description", 'content', "update_time", "cover_img", 'read_time')
 
 
-class ArticleSimpleSerializer(serializers.ModelSerializer):
+class ArticleSimpleSerializer(CoverImgMixin, PrimaryCategoryMixin, serializers.ModelSerializer):
     cover_img = serializers.SerializerMethodField()
     category = serializers.SerializerMethodField(read_only=True)
 
-    def get_cover_img(self, obj):
-        options = self.context.get('options', ImgProxyOptions.COVER_IMG)
-        return imgproxy.get_img_url(obj.cover_img, options=options)
-        # return obj.cover_img
-
-    def get_category(self, obj):
-        category_obj = obj.categories.first()
-        return CategorySerializer(category_obj).data
-
     class Meta:
         model = article_models.Article
         fields = ("uid", "slug", "title", "category", "cover_img", "rank")
+        list_serializer_class = ArticleListSerializer
+        prefetch_fields = ('categories',)
 
 
-class ArticleMiddleSerializer(serializers.ModelSerializer):
+class ArticleMiddleSerializer(CoverImgMixin, PrimaryCategoryMixin, serializers.ModelSerializer):
     cover_img = serializers.SerializerMethodField()
     category = serializers.SerializerMethodField(read_only=True)
 
-    def get_cover_img(self, obj):
-        options = self.context.get('options', ImgProxyOptions.COVER_IMG)
-        return imgproxy.get_img_url(obj.cover_img, options=options)
-
-    def get_category(self, obj):
-        category_obj = obj.categories.first()
-        return CategorySerializer(category_obj).data
-
     class Meta:
         model = article_models.Article
         fields = ("uid", "title", "description", "category", "cover_img", "rank")
+        list_serializer_class = ArticleListSerializer
+        prefetch_fields = ('categories',)
 
 
 class DiscussionSerializer(serializers.Serializer):
     uid = serializers.CharField(read_only=True)
 
     article = ArticleSimpleSerializer()
-
-
-class ArticleSitemapSerializer(serializers.ModelSerializer):
-    url = serializers.SerializerMethodField(read_only=True)
-    changefreq = serializers.CharField(read_only=True, default='daily')
-    priority = serializers.FloatField(read_only=True, default=0.6)
-    lastmod = serializers.SerializerMethodField(read_only=True)
-
-    def get_url(self, obj):
-        route = self.context.get('route')
-        return f'/{route}/{obj.uid}'
-
-    def get_lastmod(self, obj):
-        return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+00:00')
-
-    class Meta:
-        model = article_models.Article
-        fields = ('url', 'changefreq', 'priority', 'lastmod')
@@ -0,0 +1,14 @@
+"""
+文章相关信号
+"""
+
+from django.dispatch import Signal
+
+# 文章批量写入/删除后发送
+# uids: 变更的文章 uid 列表, 已删除的文章同样包含在内
+# category_ids: 可选, 文章被移出的分类 id
+articles_changed = Signal()
+
+# 搜索广告信息写入/删除后发送
+# uids: 变更的广告 uid 列表
+search_ad_infos_changed = Signal()
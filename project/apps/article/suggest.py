@@ -0,0 +1,266 @@
+"""
+搜索联想
+
+进程内前缀索引, 由文章标题、标签名与分类名构建, 查询时不访问数据库
+名称按单词切分, 检索词的单词需在名称中连续出现, 最后一个单词只需前缀匹配('car g' 匹配 'Best car guide')
+
+每类数据一个 PrefixIndex:
+- 条目按排序值(标题为 rank, 其次名称长度)排列, 位置即名次, 字符串拼接保存, 不为每个条目创建对象
+- 单词表有序, 每个单词对应包含它的条目位置(升序)
+- 查询时按位置顺序取出候选, 取满 size 个即停止, 结果即排序值最小的 size 个
+- 一两个字符的前缀预先计算排在最前的条目
+- 增量更新记录在差量数据中, 超过 REBUILD_THRESHOLD 后在后台重建
+
+suggest_index.suggest('car g', 5) -> {'title_list': [...], 'tag_list': [...], 'category_list': [...]}
+"""
+
+import heapq
+from array import array
+from bisect import bisect_left
+from itertools import islice
+
+from django.conf import settings
+from django.dispatch import receiver
+
+from utils.local_index import LocalIndex
+from article import models as article_models
+from article import signals as article_signals
+from article.search import TOKEN_RE
+
+# 预先计算结果的前缀最大长度
+TOP_PREFIX_LENGTH = 2
+# 差量数据超过该数量时全量重建
+REBUILD_THRESHOLD = 1000
+
+
+def normalize(text):
+    return ' '.join(TOKEN_RE.findall(text.lower()))
+
+
+def is_match(query, text):
+    """
+    query 为归一化后的检索词, 其单词在 text 中连续出现, 最后一个单词前缀匹配
+    """
+    return f' {normalize(text)}'.find(f' {query}') >= 0
+
+
+def order_key(rank, text):
+    return rank, len(text), text
+
+
+class StringColumn:
+    """
+    拼接保存的字符串列表
+    """
+
+    def __init__(self, strings):
+        self.offsets = array('I', [0])
+        for string in strings:
+            self.offsets.append(self.offsets[-1] + len(string))
+        self.blob = ''.join(strings)
+
+    def __getitem__(self, index):
+        return self.blob[self.offsets[index]:self.offsets[index + 1]]
+
+
+class PrefixIndex:
+    """
+    一类数据的前缀索引, rows 为 [(rank, 名称, id, 附加值), ...]
+    """
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: order_key(row[0], row[1]))
+        self.ranks = array('I', [row[0] for row in rows])
+        self.texts = StringColumn([row[1] for row in rows])
+        self.idents = StringColumn([row[2] for row in rows])
+        self.extras = StringColumn([row[3] for row in rows])
+        # 按 id 排序的位置, 由 id 查找位置
+        self.ident_order = array('I', sorted(range(len(rows)), key=lambda position: rows[position][2]))
+
+        posting_map = {}
+        for position, row in enumerate(rows):
+            for word in set(TOKEN_RE.findall(row[1].lower())):
+                posting_map.setdefault(word, array('I')).append(position)
+        self.words = sorted(posting_map)
+        self.postings = [posting_map[word] for word in self.words]
+
+        # 留出余量, 差量数据删除部分条目后仍够用
+        self.top_size = settings.SUGGEST_MAX_SIZE * 2
+        prefixes = {word[:length] for word in self.words for length in range(1, TOP_PREFIX_LENGTH + 1)}
+        self.top_map = {prefix: array('I', islice(self.merge_range(prefix), self.top_size)) for prefix in prefixes}
+
+        # 差量数据: 已删除或已修改的位置, 新增或修改后的条目 {id: (rank, 名称, 附加值)}
+        self.removed = set()
+        self.changed = {}
+
+    @property
+    def delta_size(self):
+        return len(self.removed) + len(self.changed)
+
+    def find(self, ident):
+        """
+        id 对应的位置, 不存在时为 None
+        """
+        index = bisect_left(self.ident_order, ident, key=lambda position: self.idents[position])
+        if index < len(self.ident_order) and self.idents[self.ident_order[index]] == ident:
+            return self.ident_order[index]
+        return None
+
+    def contains(self, ident):
+        if ident in self.changed:
+            return True
+        position = self.find(ident)
+        return position is not None and position not in self.removed
+
+    def put(self, ident, rank, text, extra=''):
+        self.remove(ident)
+        self.changed[ident] = (rank, text, extra)
+
+    def remove(self, ident):
+        self.changed.pop(ident, None)
+        position = self.find(ident)
+        if position is not None:
+            self.removed.add(position)
+
+    def merge_range(self, prefix):
+        """
+        包含以 prefix 开头的单词的条目位置, 升序且不重复
+        """
+        start = bisect_left(self.words, prefix)
+        end = bisect_left(self.words, prefix + '\U0010ffff', lo=start)
+        last = None
+        for position in heapq.merge(*self.postings[start:end]):
+            if position != last:
+                last = position
+                yield position
+
+    def iter_positions(self, query):
+        """
+        匹配的条目位置, 升序
+        """
+        *words, prefix = query.split(' ')
+        if words:
+            posting_list = []
+            for word in set(words):
+                index = bisect_left(self.words, word)
+                if index == len(self.words) or self.words[index] != word:
+                    return
+                posting_list.append(self.postings[index])
+            # 逐个检查最短的单词列表, 最多检查 SUGGEST_SCAN_LIMIT 个, 只影响召回, 不影响顺序
+            candidates = islice(min(posting_list, key=len), settings.SUGGEST_SCAN_LIMIT)
+            yield from (position for position in candidates if is_match(query, self.texts[position]))
+            return
+
+        top = self.top_map.get(prefix) if len(prefix) <= TOP_PREFIX_LENGTH else None
+        if top is None:
+            yield from self.merge_range(prefix)
+            return
+        yield from top
+        if len(top) == self.top_size:
+            yield from (position for position in self.merge_range(prefix) if position > top[-1])
+
+    def search(self, query, size):
+        """
+        排序值最小的 size 个匹配条目, 返回 [(id, 名称, 附加值), ...]
+        """
+        base = (
+            (order_key(self.ranks[position], self.texts[position]), self.idents[position], self.texts[position],
+             self.extras[position])
+            for position in self.iter_positions(query) if position not in self.removed
+        )
+        changed = sorted(
+            (order_key(rank, text), ident, text, extra)
+            for ident, (rank, text, extra) in self.changed.items() if is_match(query, text)
+        )
+        return [item[1:] for item in islice(heapq.merge(base, changed), size)]
+
+
+def article_row(uid, slug, title, rank):
+    return rank, title, uid, slug or ''
+
+
+def category_row(name, slug):
+    return 0, name, slug, ''
+
+
+class SuggestIndex(LocalIndex):
+    tag = 'index:suggest'
+
+    def __init__(self):
+        super().__init__()
+        self.title_index = PrefixIndex([])
+        self.tag_index = PrefixIndex([])
+        self.category_index = PrefixIndex([])
+
+    def build(self):
+        title_index = PrefixIndex([
+            article_row(*row)
+            for row in article_models.Article.objects.values_list('uid', 'slug', 'title', 'rank').iterator()
+        ])
+        tag_index = PrefixIndex([
+            (0, name, name, '') for name in article_models.Tag.objects.values_list('name', flat=True).iterator()
+        ])
+        category_index = PrefixIndex([
+            category_row(*row) for row in article_models.Category.objects.values_list('name', 'slug').iterator()
+        ])
+        with self.lock:
+            self.title_index = title_index
+            self.tag_index = tag_index
+            self.category_index = category_index
+
+    def update(self, uids):
+        """
+        文章写入后更新标题, 并加入新增的标签与分类, 差量数据过多时后台重建
+        """
+        with self.lock:
+            if self.loaded:
+                self._update(uids)
+                delta_size = sum(index.delta_size for index in (self.title_index, self.tag_index,
+                                                                self.category_index))
+                if delta_size > REBUILD_THRESHOLD:
+                    self.invalidate()
+                    return
+        self.bump()
+
+    def _update(self, uids):
+        for uid in uids:
+            self.title_index.remove(uid)
+        for row in article_models.Article.objects.filter(uid__in=uids).values_list('uid', 'slug', 'title', 'rank'):
+            rank, title, uid, slug = article_row(*row)
+            self.title_index.put(uid, rank, title, slug)
+        for name in article_models.Tag.objects.filter(articles__uid__in=uids).values_list('name', flat=True).distinct():
+            if not self.tag_index.contains(name):
+                self.tag_index.put(name, 0, name)
+        category_rows = article_models.Category.objects.filter(articles__uid__in=uids).values_list(
+            'name', 'slug').distinct()
+        for row in category_rows:
+            rank, name, slug, _ = category_row(*row)
+            self.category_index.put(slug, rank, name)
+
+    def suggest(self, prefix, size):
+        """
+        前缀匹配的标题、标签与分类, 各取排序靠前的 size 个
+        """
+        query = normalize(prefix)
+        result = {'title_list': [], 'tag_list': [], 'category_list': []}
+        if not query or not size:
+            return result
+        self.ensure()
+        with self.lock:
+            result['title_list'] = [
+                {'uid': uid, 'slug': slug or None, 'title': title}
+                for uid, title, slug in self.title_index.search(query, size)
+            ]
+            result['tag_list'] = [name for name, _, _ in self.tag_index.search(query, size)]
+            result['category_list'] = [
+                {'name': name, 'slug': slug} for slug, name, _ in self.category_index.search(query, size)
+            ]
+        return result
+
+
+suggest_index = SuggestIndex()
+
+
+@receiver(article_signals.articles_changed)
+def update_suggest_index(sender, uids, **kwargs):
+    suggest_index.update(uids)
@@ -0,0 +1,533 @@
+import gzip
+import json
+import time
+import random
+from unittest import mock
+from datetime import datetime, timedelta
+from urllib.parse import urlparse, parse_qs
+
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import TestCase, SimpleTestCase, RequestFactory, override_settings
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from utils import cache as cache_utils
+from utils.cache import cache_response, bump
+from utils.fragments import representation_key
+from utils import page_cache
+from utils.pagination import APICursorPagination, CachedCountPaginator, CatalogPageNumberPagination
+from utils.local_cache import local_cache
+from utils.local_index import LocalIndex
+from article import models as article_models
+from article import serializers as article_serializers
+from article.ad_terms import ad_term_index
+from article.ranks import category_ranks
+from article.suggest import PrefixIndex, suggest_index, order_key, normalize, is_match
+
+
+def create_articles(count):
+    category_list = [
+        article_models.Category.objects.create(name=name)
+        for name in ('Vehicle Donation', 'Repair')
+    ]
+    tag_list = [article_models.Tag.objects.create(name=name) for name in ('car', 'tire', 'auto')]
+    for index in range(count):
+        article = article_models.Article.objects.create(
+            uid=f'u{index:03d}', title=f'Best car guide {index}', slug=f'best-car-guide-{index}',
+            description=f'All about car {index}', content='x' * 100, cover_img=f'img{index}.jpg')
+        article.categories.set(category_list[:index % 2 + 1])
+        article.tags.set(tag_list[:index % 3 + 1])
+
+
+class ArticleQueryCountTest(TestCase):
+    """
+    列表与详情接口的查询次数与条数无关
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        create_articles(60)
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        # 进程内索引在计数前构建
+        for index in list(LocalIndex.instances):
+            index.reset()
+            index.ensure()
+
+    def get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_index_page(self):
+        with self.assertNumQueries(2):
+            self.get('/api/v1/article/page/index')
+
+    def test_search_data_size(self):
+        with self.assertNumQueries(2):
+            self.get('/api/v1/article/data/q?q=car&size=5')
+        cache.clear()
+        with self.assertNumQueries(2):
+            self.get('/api/v1/article/data/q?q=car&size=50')
+
+    def test_category_data_size(self):
+        with self.assertNumQueries(3):
+            self.get('/api/v1/article/data/c/repair?size=5')
+        cache.clear()
+        with self.assertNumQueries(3):
+            self.get('/api/v1/article/data/c/repair?size=50')
+
+    def test_category_page(self):
+        with self.assertNumQueries(4):
+            self.get('/api/v1/article/page/c/repair')
+
+    def test_article_page(self):
+        with self.assertNumQueries(3):
+            self.get('/api/v1/article/page/article/u001')
+
+    def test_cached_article_page(self):
+        self.get('/api/v1/article/page/article/u001')
+        with self.assertNumQueries(0):
+            self.get('/api/v1/article/page/article/u001')
+
+
+class RepresentationCacheTest(TestCase):
+    """
+    文章列表的序列化结果按文章缓存, 查询期间变更过的文章不写入
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        create_articles(3)
+
+    def setUp(self):
+        cache.clear()
+
+    def representation(self, uid):
+        serializer = article_serializers.ArticleSimpleSerializer()
+        return cache.get(representation_key(serializer, uid, serializer.get_cover_img_options().name))
+
+    def test_cached_per_article(self):
+        article_serializers.ArticleSimpleSerializer(article_models.Article.objects.all(), many=True).data
+        self.assertEqual(self.representation('u001')['data']['uid'], 'u001')
+
+    def test_changed_during_load_not_cached(self):
+        loaded_at = time.time()
+        article_list = list(article_models.Article.objects.order_by('uid'))
+        # 查询之后、读取版本号之前文章被修改
+        bump('article', 'u001')
+        data = article_serializers.ArticleSimpleSerializer(article_list, many=True,
+                                                           context={'loaded_at': loaded_at}).data
+        self.assertEqual([item['uid'] for item in data], ['u000', 'u001', 'u002'])
+        self.assertIsNone(self.representation('u001'))
+        self.assertIsNotNone(self.representation('u002'))
+
+
+class PaginationTest(TestCase):
+    """
+    游标分页与总数缓存
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        create_articles(7)
+        # 部分文章更新时间相同, 按 uid 区分先后
+        now = datetime.now()
+        article_models.Article.objects.filter(uid__lte='u003').update(update_time=now - timedelta(days=1))
+        article_models.Article.objects.filter(uid__gt='u003').update(update_time=now)
+
+    def setUp(self):
+        cache.clear()
+
+    def paginate(self, object_list, cursor='', size=3):
+        paginator = APICursorPagination()
+        request = Request(RequestFactory().get('/', {'cursor': cursor, 'size': size}))
+        return paginator, paginator.paginate_queryset(object_list, request)
+
+    def get_cursor(self, link):
+        return parse_qs(urlparse(link).query)['cursor'][0] if link else None
+
+    def walk(self, object_list):
+        """
+        依次向后翻页到最后一页, 再向前翻页到第一页
+        """
+        forward = []
+        paginator, page = self.paginate(object_list)
+        forward.append(page)
+        while paginator.get_next_link():
+            paginator, page = self.paginate(object_list, self.get_cursor(paginator.get_next_link()))
+            forward.append(page)
+        backward = []
+        while paginator.get_previous_link():
+            paginator, page = self.paginate(object_list, self.get_cursor(paginator.get_previous_link()))
+            backward.append(page)
+        return forward, backward
+
+    def test_keyset_cursor(self):
+        expected = list(article_models.Article.objects.order_by('-update_time', '-uid').values_list('uid', flat=True))
+        self.assertEqual(expected[:4], ['u006', 'u005', 'u004', 'u003'])
+        forward, backward = self.walk(article_models.Article.objects.all())
+        self.assertEqual(forward, [expected[0:3], expected[3:6], expected[6:7]])
+        self.assertEqual(backward, [expected[3:6], expected[0:3]])
+
+    def test_uid_list_cursor(self):
+        uid_list = [f'u{index:03d}' for index in (3, 1, 6, 0, 2, 5, 4)]
+        forward, backward = self.walk(uid_list)
+        self.assertEqual(forward, [uid_list[0:3], uid_list[3:6], uid_list[6:7]])
+        self.assertEqual(backward, [uid_list[3:6], uid_list[0:3]])
+
+    def test_uid_list_changed(self):
+        uid_list = [f'u{index:03d}' for index in range(7)]
+        paginator, _ = self.paginate(uid_list)
+        # 翻页前列表头部的条目被移除, 以游标中的 uid 定位
+        _, page = self.paginate(uid_list[1:], self.get_cursor(paginator.get_next_link()))
+        self.assertEqual(page, ['u003', 'u004', 'u005'])
+
+    def test_malformed_cursor(self):
+        for cursor in ('not-base64!', 'bm90IGpzb24=', 'WzAsIDFd'):
+            _, page = self.paginate(article_models.Article.objects.all(), cursor)
+            self.assertIsNone(page)
+        response = self.client.get('/api/v1/article/data/c/repair?cursor=not-base64!')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cached_count(self):
+        queryset = article_models.Article.objects.order_by('uid')
+        with self.assertNumQueries(1):
+            self.assertEqual(CachedCountPaginator(queryset, 3, count_cache_deps=('catalog',)).count, 7)
+        with self.assertNumQueries(0):
+            self.assertEqual(CachedCountPaginator(queryset, 3, count_cache_deps=('catalog',)).count, 7)
+        bump('catalog')
+        with self.assertNumQueries(1):
+            self.assertEqual(CachedCountPaginator(queryset, 3, count_cache_deps=('catalog',)).count, 7)
+
+    def test_count_cap(self):
+        queryset = article_models.Article.objects.order_by('uid')
+        paginator = CachedCountPaginator(queryset, 3, count_cache_deps=('catalog',), count_cap=5)
+        self.assertEqual(paginator.count, 5)
+        self.assertEqual(paginator.num_pages, 2)
+        self.assertEqual(paginator.display_count, '5+')
+        paginator = CachedCountPaginator(queryset, 3, count_cache_deps=('catalog',), count_cap=7)
+        self.assertEqual(paginator.display_count, 7)
+
+    def test_catalog_pagination_count_shared_by_pages(self):
+        queryset = article_models.Article.objects.order_by('uid')
+        for page, expected in ((1, ['u000', 'u001', 'u002']), (2, ['u003', 'u004', 'u005'])):
+            paginator = CatalogPageNumberPagination()
+            request = Request(RequestFactory().get('/', {'page': page, 'size': 3}))
+            # 第二页只查询当前页, 总数来自缓存
+            with self.assertNumQueries(2 if page == 1 else 1):
+                self.assertEqual([article.uid for article in paginator.paginate_queryset(queryset, request)],
+                                 expected)
+            self.assertEqual(paginator.page.paginator.count, 7)
+
+
+class LocalIndexTestMixin:
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        for index in list(LocalIndex.instances):
+            index.reset()
+
+    def rebuild_after_remote_bump(self, index):
+        """
+        其他进程写入后刷新版本号, 本进程下次检查时发现变化并重建
+        重建在后台线程执行, 这里改为检查后同步调用
+        """
+        cache_utils.bump(index.tag)
+        index._checked_at -= index.check_interval
+        with mock.patch.object(LocalIndex, 'start_rebuild', autospec=True) as start_rebuild:
+            index.ensure()
+        start_rebuild.assert_called_once_with(index)
+        index.rebuild()
+
+
+class SuggestTest(LocalIndexTestMixin, TestCase):
+    """
+    搜索联想
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        create_articles(30)
+        for index, article in enumerate(article_models.Article.objects.order_by('uid')):
+            article_models.Article.objects.filter(pk=article.pk).update(rank=(index * 7) % 30)
+
+    def suggest(self, q, size=None):
+        params = {'q': q} if size is None else {'q': q, 'size': size}
+        response = self.client.get('/api/v1/article/data/suggest', params)
+        return response.status_code, json.loads(response.content).get('data')
+
+    def test_prefix_index_top_k(self):
+        random_ = random.Random(0)
+        words = ['car', 'cart', 'cab', 'cat', 'care', 'bike']
+        rows = [
+            (random_.randrange(50), f'{random_.choice(words)} {random_.choice(words)} {index}', f'i{index:03d}', '')
+            for index in range(300)
+        ]
+        prefix_index = PrefixIndex(rows)
+        # 差量数据: 删除部分条目, 修改部分条目的排序值
+        for _, _, ident, _ in rows[:40]:
+            prefix_index.remove(ident)
+        for rank, text, ident, extra in rows[40:60]:
+            prefix_index.put(ident, 0, text, extra)
+        current_rows = [(0, *row[1:]) if 40 <= index < 60 else row for index, row in enumerate(rows) if index >= 40]
+
+        for query in ('c', 'ca', 'car', 'cart', 'car c', 'b', 'bike car'):
+            expected = sorted(
+                (order_key(rank, text), ident) for rank, text, ident, _ in current_rows
+                if is_match(normalize(query), text)
+            )
+            for size in (1, 5, 20, 40):
+                self.assertEqual([ident for ident, _, _ in prefix_index.search(normalize(query), size)],
+                                 [ident for _, ident in expected[:size]], (query, size))
+
+    def test_suggest_view_order(self):
+        status_code, data = self.suggest('best car g', 5)
+        self.assertEqual(status_code, 200)
+        expected = article_models.Article.objects.order_by('rank', 'title').values_list('uid', flat=True)[:5]
+        self.assertEqual([item['uid'] for item in data['titleList']], list(expected))
+        self.assertEqual(data['tagList'], [])
+        status_code, data = self.suggest('re')
+        self.assertEqual(data['categoryList'], [{'name': 'Repair', 'slug': 'repair'}])
+        self.assertEqual(data['tagList'], [])
+
+    def test_size_bounds(self):
+        for size in (0, -1):
+            status_code, data = self.suggest('car', size)
+            self.assertEqual(status_code, 200)
+            self.assertEqual(data, {'titleList': [], 'tagList': [], 'categoryList': []})
+        status_code, data = self.suggest('car', 1000)
+        self.assertEqual(len(data['titleList']), 20)
+        status_code, _ = self.suggest('car', 'x')
+        self.assertEqual(status_code, 400)
+
+    def test_rebuild_after_remote_bump(self):
+        self.assertEqual(suggest_index.suggest('zebra', 5)['title_list'], [])
+        # 其他进程写入, 本进程未收到信号
+        article_models.Article.objects.create(uid='z001', title='Zebra crossing', slug='zebra-crossing', rank=1)
+        self.assertEqual(suggest_index.suggest('zebra', 5)['title_list'], [])
+        self.rebuild_after_remote_bump(suggest_index)
+        self.assertEqual(suggest_index.suggest('zebra', 5)['title_list'],
+                         [{'uid': 'z001', 'slug': 'zebra-crossing', 'title': 'Zebra crossing'}])
+
+
+class AdTermIndexTest(LocalIndexTestMixin, TestCase):
+    """
+    搜索广告关键词索引
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        create_articles(3)
+        article_models.SearchAdInfo.objects.create(uid='ad1', terms='Car, Tire Repair ,, ')
+        article_models.SearchAdInfo.objects.create(uid='ad2', terms='car')
+
+    def test_is_own_and_lookup(self):
+        self.assertTrue(ad_term_index.is_own('ad1', ' CAR '))
+        self.assertTrue(ad_term_index.is_own('ad1', 'tire  repair'))
+        self.assertFalse(ad_term_index.is_own('ad2', 'tire repair'))
+        self.assertFalse(ad_term_index.is_own(None, 'car'))
+        self.assertEqual(ad_term_index.lookup('Car'), ['ad1', 'ad2'])
+        self.assertEqual(ad_term_index.lookup(''), [])
+
+    def test_search_page_is_own(self):
+        response = self.client.get('/api/v1/article/page/q', {'q': 'Car', 'saiId': 'ad2'})
+        self.assertTrue(json.loads(response.content)['data']['isOwn'])
+        response = self.client.get('/api/v1/article/page/q', {'q': 'Tire', 'saiId': 'ad2'})
+        self.assertFalse(json.loads(response.content)['data']['isOwn'])
+
+    def test_local_update(self):
+        self.assertEqual(ad_term_index.lookup('auto'), [])
+        article_models.SearchAdInfo.objects.filter(uid='ad2').update(terms='auto')
+        ad_term_index.update(['ad2'])
+        self.assertEqual(ad_term_index.lookup('auto'), ['ad2'])
+        self.assertEqual(ad_term_index.lookup('car'), ['ad1'])
+
+    def test_rebuild_after_remote_bump(self):
+        self.assertFalse(ad_term_index.is_own('ad2', 'auto'))
+        # 其他进程写入, 本进程未收到信号
+        article_models.SearchAdInfo.objects.filter(uid='ad2').update(terms='auto')
+        self.assertFalse(ad_term_index.is_own('ad2', 'auto'))
+        self.rebuild_after_remote_bump(ad_term_index)
+        self.assertTrue(ad_term_index.is_own('ad2', 'auto'))
+        self.assertFalse(ad_term_index.is_own('ad2', 'car'))
+
+
+@override_settings(AUTH_TOKEN='test-token')
+class CategoryRanksTest(LocalIndexTestMixin, TestCase):
+    """
+    分类排行
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        create_articles(6)
+        article_models.CategoryGroupRank.objects.create(slug='repair', rank=['u003', 'u001', 'u003', 'u005'])
+
+    def get_category_page(self):
+        response = self.client.get('/api/v1/article/page/c/repair')
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)['data']
+
+    def test_get(self):
+        self.assertEqual(category_ranks.get('repair'), ['u003', 'u001', 'u005'])
+        self.assertEqual(category_ranks.get('missing'), [])
+
+    def test_category_page_order(self):
+        data = self.get_category_page()
+        self.assertEqual(data['topArticle']['uid'], 'u003')
+        self.assertEqual([item['uid'] for item in data['trendingArticleList']], ['u001', 'u005'])
+        self.assertNotIn('u003', [item['uid'] for item in data['recentArticleList']])
+
+    def test_update_category_rank(self):
+        self.get_category_page()
+        response = self.client.post('/api/v1/system/article/article_data/update_category_rank',
+                                    {'data': {'category_name': 'Repair', 'rank': ['u005', 'u001']}},
+                                    content_type='application/json', HTTP_AUTHORIZATION='test-token')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(category_ranks.get('repair'), ['u005', 'u001'])
+        data = self.get_category_page()
+        self.assertEqual(data['topArticle']['uid'], 'u005')
+        self.assertEqual([item['uid'] for item in data['trendingArticleList']], ['u001'])
+
+    def test_rebuild_after_remote_bump(self):
+        self.assertEqual(category_ranks.get('repair'), ['u003', 'u001', 'u005'])
+        # 其他进程写入, 本进程未收到信号
+        article_models.CategoryGroupRank.objects.filter(slug='repair').update(rank=['u001'])
+        self.assertEqual(category_ranks.get('repair'), ['u003', 'u001', 'u005'])
+        self.rebuild_after_remote_bump(category_ranks)
+        self.assertEqual(category_ranks.get('repair'), ['u001'])
+
+
+@mock.patch.object(page_cache, 'brotli', None)
+class PageCacheTest(LocalIndexTestMixin, TestCase):
+    """
+    整页缓存的压缩与条件请求, 测试环境未安装 brotli
+    """
+    url = '/api/v1/article/page/c/repair'
+
+    @classmethod
+    def setUpTestData(cls):
+        create_articles(30)
+
+    def test_gzip(self):
+        plain = self.client.get(self.url)
+        self.assertEqual(plain.status_code, 200)
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+        self.assertTrue(plain['Cache-Control'].startswith('public, max-age='))
+
+        compressed = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertEqual(int(compressed['Content-Length']), len(compressed.content))
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+
+        # 只接受 br 时返回未压缩内容
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, plain.content)
+
+    def test_etag(self):
+        first = self.client.get(self.url)
+        etag = first['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        # 压缩与否 ETag 一致
+        self.assertEqual(self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')['ETag'], etag)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=f'W/"other", {etag}')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='W/"other"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, first.content)
+
+    def test_etag_changes_after_bump(self):
+        etag = self.client.get(self.url)['ETag']
+        article_models.Article.objects.filter(uid='u001').update(title='Changed title')
+        bump('article', 'u001')
+        bump('category', 'repair')
+        # 依赖变更后重新渲染, 旧 ETag 不再返回 304(刚变更的依赖在时钟误差范围内, 响应暂不缓存)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Changed title', response.content)
+        self.assertNotEqual(response.get('ETag'), etag)
+
+
+class CountingView(APIView):
+    render_count = 0
+    # 渲染时执行, 模拟数据库异常等
+    on_render = None
+
+    def cache_key(self, view_instance, view_method, request, args, kwargs):
+        return 'backend:test:counting'
+
+    @cache_response(timeout=60, key_func='cache_key', deps=('test',))
+    def get(self, request):
+        CountingView.render_count += 1
+        if CountingView.on_render is not None:
+            CountingView.on_render()
+        return Response({'render_count': CountingView.render_count})
+
+
+class CacheResponseTest(SimpleTestCase):
+    """
+    cache_response 防击穿, 测试环境使用 LocMemCache 代替 redis
+    """
+    lock_key = 'backend:test:counting:lock'
+
+    def setUp(self):
+        cache.clear()
+        CountingView.render_count = 0
+        CountingView.on_render = None
+
+    def get(self):
+        response = CountingView.as_view()(RequestFactory().get('/'))
+        return json.loads(response.content)['renderCount']
+
+    def raise_database_error(self):
+        raise DatabaseError('gone away')
+
+    def test_cached(self):
+        self.assertEqual(self.get(), 1)
+        self.assertEqual(self.get(), 1)
+        bump('test')
+        self.assertEqual(self.get(), 2)
+
+    def test_stale_entry_served_while_locked(self):
+        self.get()
+        bump('test')
+        # 其他请求正在重新计算
+        cache.add(self.lock_key, 'other', 30)
+        self.assertEqual(self.get(), 1)
+        self.assertEqual(CountingView.render_count, 1)
+
+    def test_database_error_returns_stale_entry(self):
+        self.get()
+        bump('test')
+        CountingView.on_render = self.raise_database_error
+        self.assertEqual(self.get(), 1)
+        self.assertIsNone(cache.get(self.lock_key))
+
+    def test_database_error_without_entry(self):
+        CountingView.on_render = self.raise_database_error
+        with self.assertRaises(DatabaseError):
+            self.get()
+        self.assertIsNone(cache.get(self.lock_key))
+
+    def test_lock_released_after_render(self):
+        self.get()
+        self.assertIsNone(cache.get(self.lock_key))
+
+    def test_lock_taken_over_is_kept(self):
+        # 渲染超过锁超时时间, 锁已被其他请求获取
+        CountingView.on_render = lambda: cache.set(self.lock_key, 'other', 30)
+        self.get()
+        self.assertEqual(cache.get(self.lock_key), 'other')
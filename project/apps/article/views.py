@@ -1,48 +1,83 @@
-from django.db.models import Q, Case, When, IntegerField
 from django.conf import settings
+import time
 import random
 from rest_framework import status as drf_status
 from rest_framework.views import APIView
-from rest_framework.response import Response
-from rest_framework_extensions.cache.decorators import cache_response
 
+from utils.cache import cache_response, depend_on
 from utils.imgproxy import ImgProxyOptions
 from utils.response import APIResponse
-from utils.pagination import APIPageNumberPagination
+from utils.pagination import CatalogPageNumberPagination, APICursorPagination
+from utils.projection import project
+from utils.fragments import Fragment, get_fragments
 from article import models as article_models
 from article import serializers as article_serializers
+from article.search import search_article_uids, normalize_query
+from article.suggest import suggest_index
+from article.sampler import article_sampler
+from article.ranks import category_ranks
+from article.discussion import discussion_links
+from article.ad_terms import ad_term_index
 
 
 def get_paginated_data(queryset, request, serializer_class, data_key='new_data', *args, **kwargs):
     """
     快速分页
+    cursor=True 时支持游标分页, 请求带 cursor 参数时启用, 见 APICursorPagination
     """
 
-    paginator = APIPageNumberPagination()
-    data_page = paginator.paginate_queryset(queryset, request)
+    if kwargs.get('cursor') and APICursorPagination.is_requested(request):
+        paginator = APICursorPagination()
+    else:
+        paginator = CatalogPageNumberPagination()
+    loaded_at = time.time()
+    data_page = paginator.paginate_queryset(project(queryset, serializer_class), request)
 
     if data_page is None:
         return APIResponse(status=drf_status.HTTP_400_BAD_REQUEST)
-    context = kwargs.get('context', {})
+    if kwargs.get('hydrate') or isinstance(paginator, APICursorPagination):
+        # 分页对象为 uid 序列, 只查询当前页的文章
+        data_page = get_articles_in_order(data_page, serializer_class)
+    context = {**kwargs.get('context', {}), 'loaded_at': loaded_at}
     serialized_data = serializer_class(data_page, many=True,context=context).data
     return paginator.get_paginated_response(data={data_key: serialized_data})
 
 
+def get_articles_in_order(uid_list, serializer_class=None):
+    """
+    按 uid 序列获取文章, 保持序列顺序
+    传入 serializer_class 时只查询其用到的列
+    """
+    uid_list = list(uid_list)
+    article_list = article_models.Article.objects.filter(uid__in=uid_list)
+    if serializer_class is not None:
+        article_list = project(article_list, serializer_class)
+    article_map = {article.uid: article for article in article_list}
+    return [article_map[uid] for uid in uid_list if uid in article_map]
+
+
+def get_cursor_key(request):
+    """
+    游标分页参数, 拼接在缓存 key 后, 未使用游标分页时为空
+    """
+    if not APICursorPagination.is_requested(request):
+        return ''
+    params = request.query_params
+    return f':cursor:{params.get("cursor")}:{params.get("size")}:{params.get("count")}'
+
+
 def get_specify_sequence(uid_list_str, serializer_class, *args, **kwargs):
     """
     获取指定序列
     """
 
-    uid_list = article_models.CategoryGroupRank.objects.filter(slug=uid_list_str)
-    if not uid_list.exists():
-        return []
-    uid_list = uid_list.first().rank
+    uid_list = category_ranks.get(uid_list_str)
     if not uid_list:
         return []
 
-    article_list = article_models.Article.objects.filter(uid__in=uid_list).order_by(
-        Case(*[When(uid=uid, then=index) for index, uid in enumerate(uid_list)]))
-    context = kwargs.get('context', {})
+    loaded_at = time.time()
+    article_list = get_articles_in_order(uid_list, serializer_class)
+    context = {**kwargs.get('context', {}), 'loaded_at': loaded_at}
     article_list_data = serializer_class(article_list, many=True,context=context).data
 
     return article_list_data
@@ -52,9 +87,10 @@ class IndexPageView(APIView):
     def cache_key(self, view_instance, view_method, request, args, kwargs):
         return f'backend:article:index'
 
-    @cache_response(timeout=settings.CACHE_TIME_INDEX, key_func='cache_key')
+    @cache_response(timeout=settings.CACHE_TIME_INDEX, key_func='cache_key', local=True, early=True)
     def get(self, request):
-        index_article_list = article_models.Article.objects.all().order_by('?')[:26]
+        index_article_list = get_articles_in_order(article_sampler.sample(26),
+                                                   article_serializers.IndexArticleSerializer)
         index_article_list_data = article_serializers.IndexArticleSerializer(index_article_list, many=True).data
 
         swiper_article_list = index_article_list_data[:4]
@@ -79,15 +115,17 @@ class ArticlePageView(APIView):
     def calculate_cache_key(self, view_instance, view_method, request, args, kwargs):
         return f'backend:article:{kwargs.get("uid")}'
 
-    @cache_response(timeout=settings.CACHE_TIME_DEATAIL, key_func='calculate_cache_key')
+    @cache_response(timeout=settings.CACHE_TIME_DEATAIL, key_func='calculate_cache_key', local=True, early=True)
     def get(self, request, uid):
+        depend_on('article', uid)
         article_obj = article_models.Article.objects.filter(uid=uid).first()
         if not article_obj:
             return APIResponse(status=drf_status.HTTP_404_NOT_FOUND)
 
         current_article_data = article_serializers.ArticleDetailSerializer(article_obj).data
 
-        popular_article_list = article_models.Article.objects.exclude(uid=uid).order_by('?')[:10]
+        popular_article_list = get_articles_in_order(article_sampler.sample(10, exclude=[uid]),
+                                                     article_serializers.ArticleSimpleSerializer)
         popular_article_list_data = article_serializers.ArticleSimpleSerializer(popular_article_list, many=True,
                                                                                 context={
                                                                                     'options': ImgProxyOptions.S_COVER_IMG}).data
@@ -101,35 +139,30 @@ class ArticlePageView(APIView):
 
 class QPageView(APIView):
     def calculate_cache_key(self, view_instance, view_method, request, args, kwargs):
-        q = request.query_params.get('q', None)
-        sai_id = request.query_params.get('saiId', None)
+        # 与 search_article_uids 一致, 归一化后为空的检索词共用全部文章的缓存
+        q = normalize_query(request.query_params.get('q', ''))
+        # CamelCaseMiddleWare 已将 saiId 转为 sai_id
+        sai_id = request.query_params.get('sai_id', None)
         page = request.query_params.get('page', 1)
         size = request.query_params.get('size')
         return f'backend:article:search:{q}:{page}:{size}:{sai_id}'
 
-    @cache_response(timeout=settings.CACHE_TIME_Q, key_func='calculate_cache_key')
+    @cache_response(timeout=settings.CACHE_TIME_Q, key_func='calculate_cache_key', deps=('catalog',), early=True)
     def get(self, request):
-        q = request.query_params.get('q', '')
+        # 缓存键使用归一化后的检索词, 同一条目下的 is_own 也按归一化后的检索词判断
+        q = normalize_query(request.query_params.get('q', ''))
 
-        exact_articles = article_models.Article.objects.order_by(Case(
-            When(title__icontains=q, then=0),
-            When(description__icontains=q, then=1),
-            default=2,
-            output_field=IntegerField(),
-        ))
+        # 排序结果按检索词缓存, 与 QDataView 及其他广告共用, 只查询当前页的文章
+        uid_list = search_article_uids(q)
 
-        res = get_paginated_data(exact_articles, request, article_serializers.ArticleMiddleSerializer,
+        res = get_paginated_data(uid_list, request, article_serializers.ArticleMiddleSerializer,
                                  'search_article_list', context={
-                'options': ImgProxyOptions.S_COVER_IMG})
+                'options': ImgProxyOptions.S_COVER_IMG}, hydrate=True)
 
+        # 广告相关的内容在排序结果之上添加
         sai_id = request.query_params.get('sai_id', None)
-        search_ad_info = article_models.SearchAdInfo.objects.filter(uid=sai_id)
-
-        if search_ad_info.exists():
-            terms = [term.lower().strip() for term in search_ad_info.first().terms.split(',')]
-            is_own = q.lower().strip() in terms
-        else:
-            is_own = False
+        depend_on('ad', sai_id)
+        is_own = ad_term_index.is_own(sai_id, q)
 
         tagList = [
             ['Donate', 'Charity', 'Non-Profit', 'Tax Deduction', 'Car Donation', 'Motorcycle', 'Boat', 'Recycle'],
@@ -147,44 +180,59 @@ class QPageView(APIView):
 
 class QDataView(APIView):
     def calculate_cache_key(self, view_instance, view_method, request, args, kwargs):
-        q = request.query_params.get('q', None)
+        q = normalize_query(request.query_params.get('q', ''))
         page = request.query_params.get('page', 1)
         size = request.query_params.get('size')
-        return f'backend:article:search:{q}:{page}:{size}'
+        return f'backend:article:search:{q}:{page}:{size}{get_cursor_key(request)}'
 
-    @cache_response(timeout=settings.CACHE_TIME_Q, key_func='calculate_cache_key')
+    @cache_response(timeout=settings.CACHE_TIME_Q, key_func='calculate_cache_key', deps=('catalog',), early=True)
     def get(self, request):
         q = request.query_params.get('q','')
 
-        exact_articles = article_models.Article.objects.order_by(Case(
-            When(title__icontains=q, then=0),
-            When(description__icontains=q, then=1),
-            default=2,
-            output_field=IntegerField(),
-        ))
+        uid_list = search_article_uids(q)
 
-        res = get_paginated_data(exact_articles, request, article_serializers.ArticleMiddleSerializer,
+        res = get_paginated_data(uid_list, request, article_serializers.ArticleMiddleSerializer,
                                  'search_article_list', context={
-                'options': ImgProxyOptions.S_COVER_IMG})
+                'options': ImgProxyOptions.S_COVER_IMG}, hydrate=True, cursor=True)
 
         return res
 
 
-class ContentPageView(APIView):
+class SuggestDataView(APIView):
+    """
+    搜索联想, 由进程内前缀索引返回, 不访问数据库
+    """
 
-    def calculate_cache_key(self, view_instance, view_method, request, args, kwargs):
-        return f'backend:article:content:{kwargs.get("uid")}:{kwargs.get("slug")}'
+    def get(self, request):
+        q = request.query_params.get('q', '')
+        try:
+            size = min(int(request.query_params.get('size', settings.SUGGEST_SIZE)), settings.SUGGEST_MAX_SIZE)
+        except ValueError:
+            return APIResponse(status=drf_status.HTTP_400_BAD_REQUEST)
+        return APIResponse(data=suggest_index.suggest(q, max(size, 0)), status=drf_status.HTTP_200_OK)
+
+
+search_ad_info_fragment = Fragment(article_serializers.SearchAdInfoSerializer,
+                                   article_models.SearchAdInfo.objects.all(), namespace='ad')
+search_article_fragment = Fragment(article_serializers.SearchArticleSerializer,
+                                   article_models.Article.objects.all(), namespace='article', lookup_field='slug')
+simple_article_fragment = Fragment(article_serializers.ArticleSimpleSerializer,
+                                   article_models.Article.objects.all(), namespace='article')
+simple_article_slug_fragment = Fragment(article_serializers.ArticleSimpleSerializer,
+                                        article_models.Article.objects.all(), namespace='article', lookup_field='slug')
+
+
+class ContentPageView(APIView):
 
-    @cache_response(timeout=settings.CACHE_TIME_SEARCH_AD, key_func='calculate_cache_key')
     def get(self, request, uid, slug):
-        try:
-            search_ad_info = article_models.SearchAdInfo.objects.get(uid=uid)
-            search_article = article_models.Article.objects.get(slug=slug)
-        except Exception as e:
+        # 由片段组装, 广告信息与文章分别缓存, 各自变更时失效
+        search_ad_info_data, search_article_data = get_fragments([
+            (search_ad_info_fragment, uid),
+            (search_article_fragment, slug),
+        ])
+        if search_ad_info_data is None or search_article_data is None:
             return APIResponse(status=drf_status.HTTP_404_NOT_FOUND)
 
-        search_ad_info_data = article_serializers.SearchAdInfoSerializer(search_ad_info).data
-        search_article_data = article_serializers.SearchArticleSerializer(search_article).data
         data = {
             'search_ad_info': search_ad_info_data,
             'search_article': search_article_data
@@ -194,167 +242,38 @@ class ContentPageView(APIView):
 
 class DiscussionPageView(APIView):
 
-    def calculate_cache_key(self, view_instance, view_method, request, args, kwargs):
-        return f'backend:article:discussion:{kwargs.get("uid")}:{kwargs.get("slug")}'
-
-    @cache_response(timeout=settings.CACHE_TIME_SEARCH_AD, key_func='calculate_cache_key')
     def get(self, request, uid, slug):
-        try:
-            search_ad_info = article_models.SearchAdInfo.objects.get(uid=uid)
-            search_article = article_models.Article.objects.get(slug=slug)
-        except Exception as e:
+        # 推荐随机抽取, 不缓存整个响应, 由片段组装
+        link_list = discussion_links.sample(5, exclude=uid)
+        search_ad_info_data, search_article_data, simple_article_data, *other_article_list = get_fragments([
+            (search_ad_info_fragment, uid),
+            (search_article_fragment, slug),
+            (simple_article_slug_fragment, slug),
+            *[(simple_article_fragment, article_uid) for _, article_uid in link_list],
+        ])
+        if search_ad_info_data is None or search_article_data is None:
             return APIResponse(status=drf_status.HTTP_404_NOT_FOUND)
 
-        ad_article_map = {'KOTjSsb5': 'junk-cars-a-journey-of-value-and-opportunity',
-                          '8D3UYUH6': 'roll-with-confidence-a-journey-through-tire-services',
-                          'SAobOEx9': 'a-comprehensive-guide-to-donating-cars-for-kids',
-                          'DbAnebTS': 'shield-and-shade-unveiling-the-magic-of-window-tinting',
-                          'EgAJKXiu': 'experience-premium-pay-less-navigate-the-economical-oil-change-services',
-                          '16rqaqX9': 'in-line-the-relevance-of-expert-car-alignment-services-nearby',
-                          'iP5DtYjZ': 'glass-repairs-safeguarding-your-rides-panoramic-perspective',
-                          '7LvDpCCc': 'fueling-financial-success-the-rise-of-online-vehicle-marketplaces',
-                          'packGtF0': 'roadways-to-revenue-harnessing-the-power-of-online-vehicle-sale',
-                          'sh8Q0kpB': 'unlocking-the-value-of-selling-your-car-online',
-                          'hipmvlj3': 'empower-your-journey-discover-the-world-of-tire-services',
-                          'OMtySHpI': 'discover-the-excitement-in-driving-with-the-2024-mazda-cx-50',
-                          'Dd4qpaXC': 'rolling-into-the-future-the-electric-scooter-revolution',
-                          '2b1iKILs': 'cash-on-wheels-steering-towards-a-sustainable-future-with-car-trade-ins',
-                          'f2YdY2FU': 'driving-clean-the-journey-of-auto-detailing-excellence',
-                          'EFdffjl2': 'steering-to-the-future-decoding-the-power-of-local-vehicle-repair-services',
-                          'Njq4PZpm': 'navigating-the-wheels-a-guide-to-frugal-automotive-choices-in-2024',
-                          'aiZ4YiZc': 'transforming-old-iron-into-gold',
-                          'acNUsyby': 'revving-up-profits-unravel-the-world-of-cash-for-car-transactions',
-                          'Pg0AjMCV': 'discover-your-dream-drive-luxury-innovation-and-convenience-at-your-fingertips',
-                          'JieOpmrR': 'journey-with-trusted-allies-your-local-automotive-caregivers',
-                          'jt8ymClB': 'a-sound-brake-check-can-break-your-worries',
-                          '3Z52KUhp': 'ignite-change-with-your-car-donation',
-                          '8LygZmFD': 'the-lifeblood-of-your-ride-exploring-the-importance-of-oil-changes',
-                          'S2j2RWzA': 'unearth-the-unexpected-from-the-unwanted-the-art-of-selling-non-functioning-automobiles',
-                          'WtqWLWuU': 'veterans-car-charity-compare-car-donation-charities',
-                          'Xa3iXR39': 'decoding-the-basics-of-car-warranty-understanding-coverage-and-benefits',
-                          'Bxo3Z9cM': 'a-closer-look-at-extended-car-warranties-drive-with-confidence',
-                          'E21zPbvX': 'hit-the-jackpot-turn-your-vehicle-into-valuable-profit',
-                          '5oG6Jg0e': 'how-donating-your-car-can-support-veteransdonations',
-                          'GQdCufwO': 'virtual-vision-embrace-the-future-of-business-operations',
-                          'ztgD5OJO': 'wired-in-unveiling-the-power-of-local-electrician-servicesservices',
-                          'D8KuUEsN': 'transparency-unveiled-a-journey-through-the-looking-glass',
-                          'QBlb7h7x': 'revitalize-your-abode-the-wonders-of-replacement-services',
-                          'e5TLth3J': 'home-services-on-demand-finding-quality-near-you',
-                          'pcMCXNAc': 'warmth-in-every-sip-celebrating-the-bliss-of-custom-and-personalized-mugs',
-                          'gfpacZYY': 'the-power-of-posture-enhancing-workspaces-with-innovative-desks',
-                          'WlejltNA': 'restoring-harmony-the-art-and-efficiency-of-home-and-auto-maintenance',
-                          '3fJLvurF': 'guarding-the-canopy-the-case-for-leaf-guard-gutters',
-                          'iu2dJxTJ': 'the-modern-gold-rush-understanding-ways-to-earn-money-in-todays-digital-era',
-                          'Jf7d4QBz': 'navigating-comfort-an-insight-into-the-world-of-hvac-services',
-                          'Y2fqF672': 'gateway-to-robustness-unraveling-the-criticality-of-garage-door-repairs-and-services',
-                          'Z3xXK8Jq': 'unseen-heroes-exploring-the-world-of-septic-services',
-                          'ZLA7uNHr': 'the-golden-trail-unraveling-the-path-to-precious-investments',
-                          '9bMA1960': 'matrix-of-mobility-unraveling-the-world-of-qr-code-generation',
-                          'aw7FHD8t': 'fulfilling-daily-duties-essential-services-for-your-perfect-home',
-                          'RY8Hp3se': 'unraveling-comfort-the-art-and-utility-of-rugs-in-your-living-spaces',
-                          'KQNO7QBU': 'the-essentials-of-modern-living-unveiling-best-in-class-products-and-services',
-                          'wWwg9mjd': 'machines-of-marvel-enhancing-everyday-experience',
-                          'cDBI60uC': 'footprints-of-excellence-the-art-and-craft-of-modern-flooring-solutions',
-                          'VcLNxuiB': 'unlocking-secrets-of-security-a-closer-look-at-locksmith-services',
-                          'j1P64Km8': 'the-assurance-of-reliable-plumbing-services-round-the-clock',
-                          'JQbIKl3L': 'in-hot-water-demystifying-the-world-of-water-heater-services',
-                          '8dXJ8Q6F': 'fluid-dynamics-at-work-proficient-plumbers-safeguarding-your-domestic-bliss',
-                          'd4hMItMq': 'unlock-home-comforts-expert-maintenance-repair-and-installation-just-a-call-away',
-                          's1HLw8QN': 'tailoring-creativity-the-art-of-customized-essentials',
-                          '10MhPaHr': 'impressions-in-a-glance-the-power-of-logos-in-building-brands',
-                          'wj1a2wye': 'fanning-the-flames-a-comprehensive-guide-to-furnace-maintenance-and-repair',
-                          'mG57PQa3': 'unleashing-digital-power-the-transformative-journey-in-digital-marketing',
-                          '5GTZXpfS': 'swiping-success-amplifying-business-with-seamless-credit-card-processing',
-                          'eBOGAMXG': 'impressions-beyond-pixels-understanding-the-power-of-professional-printing-services',
-                          'FwmKNYDc': 'essential-comforts-the-foundation-of-home-repair-services',
-                          'FNQFRI6t': 'under-the-shield-celebrating-the-craft-of-roofing-professionals',
-                          'SVsnKfXX': 'streamlining-success-one-payroll-at-a-time',
-                          '8PpxLuhc': 'illuminating-the-payroll-pathway-for-success',
-                          '4YppiSDq': 'empower-your-abode-office-with-security-and-efficacy',
-                          'a8KHrW6d': 'under-the-shelter-of-security-exploring-the-world-of-roofing-services',
-                          'uMQJU39V': 'shielding-your-sanctuary-a-dive-into-the-realm-of-home-security-solutions',
-                          'xMq8c9DL': 'home-sweet-home-unleashing-the-power-of-local-services-for-a-comfortable-lifestyle',
-                          'yS1noXQR': 'embracing-ease-exploring-the-benefits-of-walk-in-tubs-and-showers',
-                          'BSWS39cL': 'embrace-the-future-navigating-the-digital-landscape',
-                          'lKZTpnnA': 'diving-into-the-digital-unboxing-the-power-of-online-advertising',
-                          'bRNLaNab': 'crowning-glory-exploring-the-multifaceted-world-of-roofing-services',
-                          '3vygSwG6': 'cozy-comfort-under-your-feet-the-intricacies-of-the-carpet-industry',
-                          'LAqZWVAH': 'chronicles-of-time-unfolding-stories-with-calendars',
-                          '9XKcvI4r': 'checks-and-balances-navigating-the-world-of-modern-verification',
-                          'KLzbBLcJ': 'ceramic-chronicles-a-journey-through-the-world-of-tiles',
-                          '0C0d61kx': 'a-portal-to-panorama-elevating-your-space-with-window-and-door-solutions',
-                          'VcUXPpQ7': 'ignite-change-with-your-car-donation-2',
-                          'JAVXWD9B': 'american-homeowners-the-secrets-to-cost-effective-roofing',
-                          'lQRVWrgb': 'killer-new-palisade-suv-attracts-every-customer',
-                          'gov0QIh0': 'ultimate-comfort-suvs-for-elderly-indulge-in-the-comforts-of-a-luxury-suv',
-                          'MQidl2oc': 'understanding-car-insurance',
-                          'z6TH0ClG': 'hybrid-suv-an-eco-friendly-and-efficient-choice',
-                          'oDzp7nne': 'economical-choices-for-seniors-buying-a-toyota-highlander',
-                          '8RP8PZN0': 'senior-friendly-strategies-to-secure-a-budget-friendly-kona',
-                          'O2SIrRBO': 'seniors-guide-to-buying-a-hyundai-ioniq-ev-on-a-budget',
-                          'wpiTIfED': 'unsold-suvs-with-zero-miles-could-be-cheap-for-seniors',
-                          'ZJNKvuQa': 'a-guide-for-seniors-on-purchasing-a-reasonably-priced-ram-1500',
-                          'AuQ6ndTu': 'the-seniors-guide-to-buying-a-buick-on-a-budget',
-                          'FVQYuboh': 'les-voitures-invendues-sont-vendues-pour-presque-rien',
-                          'cDHyeUH8': 'killer-new-palisade-suv-attracts-every-customer',
-                          'mFnJqI4F': 'a-guide-for-seniors-on-purchasing-a-reasonably-priced-ram-1500-2',
-                          '8y4pk3KT': 'used-suvs-cars-2023-sales-affordable-prices-cant-be-missed',
-                          'TLIwQXdp': 'new-small-hyundai-kona-for-seniors-the-price-might-surprise-you',
-                          'N5xzx7xx': 'how-seniors-can-get-toyota-rav4s-on-a-budget-practical-buying-tips',
-                          'oSbxqYq7': 'unsold-cars-for-seniors-are-almost-being-given-away',
-                          'uh8lrqvx': 'best-suv-buy-deals-new-leftover-suvs-are-nearly-being-given-away',
-                          'wPThKqEo': 'discover-the-new-volvo-in-2025-setting-trends-for-the-future',
-                          'cTVNqAcP': 'exploring-the-unmatched-appeal-of-the-new-jeep-grand-cherokee',
-                          'is8Dp4f6': 'oil-change-coupons-for-seniors',
-                          'LT4WPS9o': 'oil-change-coupons-your-ultimate-guide',
-                          'vwi1SJ8S': 'killer-new-palisade-suv-attracts-every-customer-2',
-                          'djuMhcPB': 'killer-new-hyundai-santafe-2024-in-hong-kong',
-                          'Ooun0A2z': 'les-voitures-invendues-sont-vendues-pour-presque-rien-2',
-                          'QNIxsYn9': 'understanding-car-insurance-2',
-                          'S7ocqhtJ': 'the-killer-new-mazda-cx-30-is-close-to-perfection',
-                          'JEdB7GA1': 'new-ram-1500-clearance-sale-prices-might-surprise-you',
-                          'MQHBzlNV': 'how-to-buy-a-reliable-used-car-on-a-budget',
-                          'NoTwxhJR': 'killer-new-palisade-suv-attracts-every-custome',
-                          'b0TvVR9E': 'unsold-cars-for-seniors-are-almost-being-given-away-2'}
-        try:
-            del ad_article_map[uid]
-        except Exception as e:
-            pass
-
-        random_keys = random.sample(list(ad_article_map), 5)
-        # 使用这些键来获取对应的值，得到随机的键值对
-        random_values = [ad_article_map[key] for key in random_keys]
-
-        search_ad_info_data = article_serializers.SearchAdInfoSerializer(search_ad_info).data
-        search_article_data = article_serializers.SearchArticleSerializer(search_article).data
-
-        share_first_article_list = article_models.Article.objects.filter(slug=slug)
-
-        articles = article_models.Article.objects.filter(slug__in=random_values).order_by(
-            Case(*[When(slug=slug, then=index) for index, slug in enumerate(random_values)])
-        )
-        # 将 random_slug_list 和 articles 配对，并将每个配对的元素组合成一个字典
-        share_other_article_list = list(
-            {"uid": uid, "article": article} for uid, article in zip(random_keys, articles))
-        article_list = [{"uid": uid, "article": article} for article in share_first_article_list]
-        share_article_list = article_list + share_other_article_list
-
-        share_article_data = article_serializers.DiscussionSerializer(share_article_list, many=True).data
+        share_article_list = [{'uid': uid, 'article': simple_article_data}] + [
+            {'uid': sai_id, 'article': article_data}
+            for (sai_id, _), article_data in zip(link_list, other_article_list) if article_data is not None
+        ]
 
         data = {
             'search_ad_info': search_ad_info_data,
             'search_article': search_article_data,
-            'share_article_list': share_article_data
+            'share_article_list': share_article_list
         }
         return APIResponse(data=data, status=drf_status.HTTP_200_OK)
 
 
 class CategoryPageView(APIView):
     def calculate_cache_key(self, view_instance, view_method, request, args, kwargs):
-        return f'backend:article:category:{kwargs.get("slug")}'
+        return f'backend:article:category:{kwargs.get("slug")}{get_cursor_key(request)}'
 
-    @cache_response(timeout=settings.CACHE_TIME_CATEGORY, key_func='calculate_cache_key')
+    @cache_response(timeout=settings.CACHE_TIME_CATEGORY, key_func='calculate_cache_key', local=True, early=True)
     def get(self, request, slug):
+        depend_on('category', slug)
         # 当前分类
         current_category = article_models.Category.objects.filter(slug=slug).first()
         if not current_category:
@@ -362,21 +281,17 @@ class CategoryPageView(APIView):
 
         category_article_list = get_specify_sequence(slug, article_serializers.CategoryArticleSerializer)
 
-        top_article_data = category_article_list[0]
+        # 没有排行时为空
+        top_article_data = category_article_list[0] if category_article_list else None
 
         trending_article_list_data = category_article_list[1:]
 
-        uid_list = article_models.CategoryGroupRank.objects.filter(slug=slug).first()
-
-        if not uid_list:
-            uid_list = []
-        else:
-            uid_list = uid_list.rank
+        uid_list = category_ranks.get(slug)
 
         recent_article_list = article_models.Article.objects.exclude(
             uid__in=uid_list).filter(categories__slug=slug).order_by('-update_time')
         res = get_paginated_data(recent_article_list, request, article_serializers.CategoryArticleSerializer,
-                                 'recent_article_list')
+                                 'recent_article_list', cursor=True)
 
         res.data['data']['top_article'] = top_article_data
         res.data['data']['trending_article_list'] = trending_article_list_data
@@ -389,20 +304,16 @@ class CategoryDataView(APIView):
         slug = kwargs.get('slug')
         page = request.query_params.get('page', 1)
         size = request.query_params.get('size')
-        return f'backend:article:API:category:{slug}:{page}:{size}'
+        return f'backend:article:API:category:{slug}:{page}:{size}{get_cursor_key(request)}'
 
-    @cache_response(timeout=settings.CACHE_TIME_API_DATA, key_func='cache_key')
+    @cache_response(timeout=settings.CACHE_TIME_API_DATA, key_func='cache_key', early=True)
     def get(self, request, slug):
+        depend_on('category', slug)
 
-        uid_list = article_models.CategoryGroupRank.objects.filter(slug=slug).first()
-
-        if not uid_list:
-            uid_list = []
-        else:
-            uid_list = uid_list.rank
+        uid_list = category_ranks.get(slug)
 
         recent_article_list = article_models.Article.objects.exclude(
             uid__in=uid_list).filter(categories__slug=slug).order_by('-update_time')
         res = get_paginated_data(recent_article_list, request, article_serializers.CategoryArticleSerializer,
-                                 'recent_article_list')
+                                 'recent_article_list', cursor=True)
         return res
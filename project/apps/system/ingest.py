@@ -0,0 +1,261 @@
+"""
+文章批量写入
+
+整批解析标签与分类, bulk_create(update_conflicts=True) 写入文章, 差量同步多对多中间表
+按 INGEST_CHUNK_SIZE 分块, 每块一个事务, 写入前校验字段类型;
+单块写入失败时逐条重试, 只有出错的文章记为失败
+
+success_uid_list, error_uid_list = ingest_articles(data)
+success_uid_list, error_uid_list = ingest_search_ad_infos(data)
+"""
+
+from datetime import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from utils.logger import log
+from article import models as article_models
+from article import signals as article_signals
+
+ARTICLE_FIELDS = ('title', 'slug', 'description', 'content', 'cover_img', 'referrer_ad_creative')
+
+
+def chunked(data, chunk_size):
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+def get_max_length(model, field_name):
+    return model._meta.get_field(field_name).max_length
+
+
+def resolve_tags(names):
+    """
+    标签名 -> id, 不存在的批量创建
+    """
+    tag_map = dict(article_models.Tag.objects.filter(name__in=names).values_list('name', 'id'))
+    missing_names = [name for name in names if name not in tag_map]
+    if missing_names:
+        article_models.Tag.objects.bulk_create(
+            [article_models.Tag(name=name) for name in missing_names], ignore_conflicts=True)
+        tag_map.update(article_models.Tag.objects.filter(name__in=missing_names).values_list('name', 'id'))
+    # MySQL 默认排序规则不区分大小写, 'car' 会命中已有的 'Car'
+    lower_map = {name.lower(): tag_id for name, tag_id in tag_map.items()}
+    return {name: tag_map.get(name, lower_map.get(name.lower())) for name in names}
+
+
+def resolve_categories(names):
+    """
+    分类名 -> id, 不存在的批量创建
+    slug 与其他分类冲突的无法创建, 对应值为 None
+    """
+    # 同名分类取 id 最小的, 与 get_or_create 命中的一致
+    category_map = {}
+    category_rows = article_models.Category.objects.filter(name__in=names).order_by('-id').values_list('name', 'id')
+    category_map.update(category_rows)
+    missing_names = [name for name in names if name not in category_map]
+    if missing_names:
+        article_models.Category.objects.bulk_create(
+            [article_models.Category(name=name, slug=slugify(name)) for name in missing_names], ignore_conflicts=True)
+        category_rows = article_models.Category.objects.filter(name__in=missing_names).order_by('-id').values_list(
+            'name', 'id')
+        category_map.update(category_rows)
+    lower_map = {name.lower(): category_id for name, category_id in category_map.items()}
+    return {name: category_map.get(name, lower_map.get(name.lower())) for name in names}
+
+
+def sync_relations(through, field_name, relation_map):
+    """
+    差量同步多对多中间表, 返回被移除的关联 id
+    relation_map: {article_uid: {related_id, ...}}
+    """
+    existing_map = defaultdict(set)
+    stale_id_list = []
+    removed_id_set = set()
+    rows = through.objects.filter(article_id__in=relation_map).values_list('id', 'article_id', field_name)
+    for row_id, article_id, related_id in rows:
+        if related_id in relation_map[article_id]:
+            existing_map[article_id].add(related_id)
+        else:
+            stale_id_list.append(row_id)
+            removed_id_set.add(related_id)
+    if stale_id_list:
+        through.objects.filter(id__in=stale_id_list).delete()
+
+    new_rows = [
+        through(article_id=article_id, **{field_name: related_id})
+        for article_id, related_ids in relation_map.items()
+        for related_id in related_ids - existing_map[article_id]
+    ]
+    through.objects.bulk_create(new_rows, batch_size=settings.INGEST_CHUNK_SIZE)
+    return removed_id_set
+
+
+def validate_article_info(article_info):
+    uid = article_info.get('uid')
+    if not isinstance(uid, str) or not uid or len(uid) > get_max_length(article_models.Article, 'uid'):
+        return False
+    for field_name in ARTICLE_FIELDS:
+        value = article_info.get(field_name, '')
+        # 只有 slug 可以为空
+        if value is None and field_name == 'slug':
+            continue
+        if not isinstance(value, str) or len(value) > get_max_length(article_models.Article, field_name):
+            return False
+    for field_name, model in (('tags', article_models.Tag), ('categories', article_models.Category)):
+        item_list = article_info.get(field_name, [])
+        if not isinstance(item_list, list):
+            return False
+        max_length = get_max_length(model, 'name')
+        for item in item_list:
+            if not isinstance(item, dict):
+                return False
+            name = item.get('name')
+            if not isinstance(name, str) or not name or len(name) > max_length:
+                return False
+    return True
+
+
+def get_slug(article_info):
+    return article_info.get('slug') or None
+
+
+def get_article_fields(article_info):
+    fields = {field_name: article_info.get(field_name, '') for field_name in ARTICLE_FIELDS}
+    # slug 唯一, 空值保存为 NULL
+    fields['slug'] = get_slug(article_info)
+    return fields
+
+
+def ingest_chunk(chunk):
+    """
+    写入一块文章, 返回 (成功 uid 列表, 失败 uid 列表, 被移出的分类 id)
+    """
+    error_uid_list = []
+    # 同一 uid 以最后一条为准
+    article_info_map = {}
+    for article_info in chunk:
+        if not isinstance(article_info, dict) or not validate_article_info(article_info):
+            error_uid_list.append(article_info.get('uid') if isinstance(article_info, dict) else None)
+            continue
+        article_info_map[article_info['uid']] = article_info
+
+    # slug 唯一, 被其他文章占用的视为失败; 没有 slug 的保存为 NULL, 不会冲突
+    slug_owner_map = dict(article_models.Article.objects.filter(
+        slug__in=[get_slug(article_info) for article_info in article_info_map.values() if get_slug(article_info)]
+    ).values_list('slug', 'uid'))
+    for uid, article_info in list(article_info_map.items()):
+        slug = get_slug(article_info)
+        if slug and slug_owner_map.setdefault(slug, uid) != uid:
+            error_uid_list.append(uid)
+            del article_info_map[uid]
+
+    tag_id_map = resolve_tags(list({
+        tag['name'] for article_info in article_info_map.values() for tag in article_info.get('tags', [])
+    }))
+    category_id_map = resolve_categories(list({
+        category['name'] for article_info in article_info_map.values()
+        for category in article_info.get('categories', [])
+    }))
+
+    tag_relation_map = {}
+    category_relation_map = {}
+    for uid, article_info in list(article_info_map.items()):
+        tag_ids = {tag_id_map[tag['name']] for tag in article_info.get('tags', [])}
+        category_ids = {category_id_map[category['name']] for category in article_info.get('categories', [])}
+        if None in tag_ids or None in category_ids:
+            error_uid_list.append(uid)
+            del article_info_map[uid]
+            continue
+        tag_relation_map[uid] = tag_ids
+        category_relation_map[uid] = category_ids
+
+    now = datetime.now()
+    article_list = [
+        article_models.Article(
+            uid=uid,
+            update_time=now,
+            **get_article_fields(article_info)
+        )
+        for uid, article_info in article_info_map.items()
+    ]
+    # MySQL 不支持指定冲突字段, 以主键冲突为准(slug 冲突已在上面排除)
+    unique_fields = ['uid'] if connection.features.supports_update_conflicts_with_target else None
+    article_models.Article.objects.bulk_create(
+        article_list,
+        update_conflicts=True,
+        update_fields=[*ARTICLE_FIELDS, 'update_time'],
+        unique_fields=unique_fields,
+        batch_size=settings.INGEST_CHUNK_SIZE
+    )
+    sync_relations(article_models.Article.tags.through, 'tag_id', tag_relation_map)
+    removed_category_ids = sync_relations(
+        article_models.Article.categories.through, 'category_id', category_relation_map)
+
+    return list(article_info_map), error_uid_list, removed_category_ids
+
+
+def ingest_chunk_or_rows(chunk):
+    """
+    整块写入, 失败时逐条重试, 每条一个事务
+    """
+    try:
+        with transaction.atomic():
+            return ingest_chunk(chunk)
+    except Exception as e:
+        log.exception(e)
+
+    success_uid_list = []
+    error_uid_list = []
+    removed_category_ids = set()
+    for article_info in chunk:
+        try:
+            with transaction.atomic():
+                row_success_uid_list, row_error_uid_list, row_removed_category_ids = ingest_chunk([article_info])
+        except Exception as e:
+            log.exception(e)
+            error_uid_list.append(article_info.get('uid') if isinstance(article_info, dict) else None)
+            continue
+        success_uid_list += row_success_uid_list
+        error_uid_list += row_error_uid_list
+        removed_category_ids |= row_removed_category_ids
+    # 同一 uid 多次出现时只记录一次
+    return list(dict.fromkeys(success_uid_list)), error_uid_list, removed_category_ids
+
+
+def ingest_articles(data, chunk_size=None):
+    """
+    批量写入文章, 返回 (成功 uid 列表, 失败 uid 列表)
+    """
+    chunk_size = chunk_size or settings.INGEST_CHUNK_SIZE
+    success_uid_list = []
+    error_uid_list = []
+    for chunk in chunked(data, chunk_size):
+        chunk_success_uid_list, chunk_error_uid_list, removed_category_ids = ingest_chunk_or_rows(chunk)
+        success_uid_list += chunk_success_uid_list
+        error_uid_list += chunk_error_uid_list
+        if chunk_success_uid_list:
+            article_signals.articles_changed.send(sender=article_models.Article, uids=chunk_success_uid_list,
+                                                  category_ids=removed_category_ids)
+    return success_uid_list, error_uid_list
+
+
+def ingest_search_ad_infos(data):
+    """
+    批量创建搜索广告信息, 返回 (成功 uid 列表, 失败 uid 列表)
+    """
+    success_uid_list = []
+    error_uid_list = []
+    for ad_info in data:
+        try:
+            article_models.SearchAdInfo.objects.create(**ad_info)
+            success_uid_list.append(ad_info.get('uid'))
+        except Exception as e:
+            log.exception(e)
+            error_uid_list.append(ad_info.get('uid'))
+    if success_uid_list:
+        article_signals.search_ad_infos_changed.send(sender=article_models.SearchAdInfo, uids=success_uid_list)
+    return success_uid_list, error_uid_list
@@ -0,0 +1,82 @@
+"""
+异步写入任务进度
+
+任务信息与每块结果分别存放在缓存中, 各块互不覆盖
+backend:system:job:{job_id}          任务信息
+backend:system:job:{job_id}:{index}  第 index 块结果
+"""
+
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+
+from utils.shortcuts import short_uuid
+
+CHUNK_PENDING = 'pending'
+CHUNK_RUNNING = 'running'
+CHUNK_SUCCESS = 'success'
+CHUNK_FAILED = 'failed'
+
+
+def job_key(job_id):
+    return f'backend:system:job:{job_id}'
+
+
+def chunk_key(job_id, index):
+    return f'backend:system:job:{job_id}:{index}'
+
+
+def create_job(kind, chunk_count, total):
+    job_id = short_uuid()
+    cache.set(job_key(job_id), {
+        'job_id': job_id,
+        'kind': kind,
+        'chunk_count': chunk_count,
+        'total': total,
+        'create_time': datetime.now().strftime(settings.TIME_FORMAT),
+    }, settings.INGEST_JOB_TIMEOUT)
+    return job_id
+
+
+def set_chunk(job_id, index, status, success_uid_list=(), error_uid_list=()):
+    cache.set(chunk_key(job_id, index), {
+        'status': status,
+        'success_uid_list': list(success_uid_list),
+        'error_uid_list': list(error_uid_list),
+    }, settings.INGEST_JOB_TIMEOUT)
+
+
+def get_job(job_id):
+    """
+    汇总任务进度, 任务不存在返回 None
+    """
+    job = cache.get(job_key(job_id))
+    if job is None:
+        return None
+
+    keys = [chunk_key(job_id, index) for index in range(job['chunk_count'])]
+    chunk_map = cache.get_many(keys)
+    chunk_list = []
+    success_uid_list = []
+    error_uid_list = []
+    for index, key in enumerate(keys):
+        chunk = chunk_map.get(key, {'status': CHUNK_PENDING, 'success_uid_list': [], 'error_uid_list': []})
+        chunk_list.append({
+            'index': index,
+            'status': chunk['status'],
+            'success_count': len(chunk['success_uid_list']),
+            'error_count': len(chunk['error_uid_list']),
+        })
+        success_uid_list += chunk['success_uid_list']
+        error_uid_list += chunk['error_uid_list']
+
+    finished_count = sum(1 for chunk in chunk_list if chunk['status'] in (CHUNK_SUCCESS, CHUNK_FAILED))
+    return {
+        **job,
+        'finished': finished_count == job['chunk_count'],
+        'finished_chunk_count': finished_count,
+        'chunk_list': chunk_list,
+        'create_success_uid_list': success_uid_list,
+        'create_error_uid_list': error_uid_list,
+    }
@@ -0,0 +1,224 @@
+"""
+接口压测
+
+在当前进程内依次请求全部前台与管理接口, 每个接口分别在冷缓存与热缓存下请求 --iterations 次,
+输出 p50 / p95 / p99 耗时(ms)、每次请求的 SQL 数量与峰值内存(字节), 结果为 JSON
+
+    python manage.py generate_catalog --size 100k --clear
+    python manage.py bench_endpoints --output before.json
+    python manage.py bench_endpoints --output after.json --compare before.json
+
+注意: 冷缓存会清空整个缓存, 请使用独立的 CACHE_REDIS_DB
+进程内索引(article.search / article.sampler 等)默认保持已加载, --cold-indexes 时每次冷请求都重建
+"""
+
+import sys
+import json
+import time
+import platform
+import tracemalloc
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from utils.local_index import LocalIndex
+from utils.local_cache import local_cache
+from article import models as article_models
+
+MODES = ('cold', 'warm')
+
+
+def percentile(sorted_values, q):
+    """
+    最近秩百分位数
+    """
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = '接口压测, 输出 JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--output', help='结果写入文件, 默认输出到 stdout')
+        parser.add_argument('--compare', help='与之前的结果对比')
+        parser.add_argument('--filter', help='只压测名称包含该字符串的接口')
+        parser.add_argument('--skip-writes', action='store_true', help='不压测写入接口')
+        parser.add_argument('--cold-indexes', action='store_true', help='冷请求时同时重建进程内索引')
+
+    def handle(self, *args, **options):
+        if not article_models.Article.objects.exists():
+            raise CommandError('没有文章数据, 先执行 generate_catalog')
+        self.client = Client(HTTP_AUTHORIZATION=settings.AUTH_TOKEN)
+        self.cold_indexes = options['cold_indexes']
+
+        endpoint_list = self.get_endpoints(skip_writes=options['skip_writes'])
+        if options['filter']:
+            endpoint_list = [endpoint for endpoint in endpoint_list if options['filter'] in endpoint['name']]
+
+        result_list = []
+        for endpoint in endpoint_list:
+            result = {'name': endpoint['name'], 'method': endpoint['method'], 'url': endpoint['url']}
+            for mode in MODES:
+                result[mode] = self.bench(endpoint, mode, options['iterations'])
+            result_list.append(result)
+            self.stderr.write(f'{endpoint["name"]}: cold p50 {result["cold"]["p50"]}ms, '
+                              f'warm p50 {result["warm"]["p50"]}ms')
+
+        report = {'meta': self.get_meta(options['iterations']), 'endpoint_list': result_list}
+        content = json.dumps(report, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(content)
+        else:
+            self.stdout.write(content)
+
+        if options['compare']:
+            with open(options['compare'], encoding='utf-8') as f:
+                self.compare(json.load(f), report)
+
+    def get_endpoints(self, skip_writes=False):
+        """
+        接口列表, 参数取自当前数据
+        """
+        article = article_models.Article.objects.order_by('uid').first()
+        rank = article_models.CategoryGroupRank.objects.exclude(rank=None).order_by('id').first()
+        category_slug = rank.slug if rank else article.categories.values_list('slug', flat=True).first()
+        ad_info = article_models.SearchAdInfo.objects.order_by('uid').first()
+        ad_uid = ad_info.uid if ad_info else 'none'
+        q = ad_info.terms.split(',')[0].strip() if ad_info else article.title.split()[0]
+        uid_list = list(article_models.Article.objects.order_by('uid').values_list('uid', flat=True)[:100])
+
+        endpoint_list = [
+            ('index', 'GET', '/api/v1/article/page/index', None),
+            ('article', 'GET', f'/api/v1/article/page/article/{article.uid}', None),
+            ('q_page', 'GET', f'/api/v1/article/page/q?q={q}&saiId={ad_uid}', None),
+            ('q_page_deep', 'GET', f'/api/v1/article/page/q?q={q}&page=5', None),
+            ('q_data', 'GET', f'/api/v1/article/data/q?q={q}', None),
+            ('q_data_empty', 'GET', '/api/v1/article/data/q', None),
+            ('suggest', 'GET', f'/api/v1/article/data/suggest?q={q[:3]}', None),
+            ('category_page', 'GET', f'/api/v1/article/page/c/{category_slug}', None),
+            ('category_data', 'GET', f'/api/v1/article/data/c/{category_slug}', None),
+            ('category_data_deep', 'GET', f'/api/v1/article/data/c/{category_slug}?page=20', None),
+            ('content', 'GET', f'/api/v1/article/page/Content/{ad_uid}/{article.slug}', None),
+            ('discussion', 'GET', f'/api/v1/article/page/Discussion/{ad_uid}/{article.slug}', None),
+            ('sitemap', 'GET', '/api/v1/system/page/sitemap', None),
+            ('sitemap_index', 'GET', '/api/v1/system/page/sitemap/index', None),
+            ('sitemap_part', 'GET', '/api/v1/system/page/sitemap/1', None),
+            ('system_article_list', 'GET', '/api/v1/system/article/article_data?page=1', None),
+            ('system_article_detail', 'GET', f'/api/v1/system/article/article_data/{article.uid}', None),
+            ('system_search_ad_info_list', 'GET', '/api/v1/system/article/search_ad_info_data', None),
+            ('system_metrics', 'GET', '/api/v1/system/metrics', None),
+            ('woogle_sheet_data', 'POST', '/api/v1/system/woogle-sheet-data', uid_list),
+        ]
+        if not skip_writes:
+            # 写入与已有数据相同的内容, 放在最后以免影响其他接口的热缓存
+            article_data = [
+                {
+                    'uid': item.uid, 'title': item.title, 'slug': item.slug, 'description': item.description,
+                    'content': item.content, 'cover_img': item.cover_img,
+                    'tags': [{'name': tag.name} for tag in item.tags.all()],
+                    'categories': [{'name': category.name} for category in item.categories.all()],
+                }
+                for item in article_models.Article.objects.filter(uid__in=uid_list).prefetch_related(
+                    'tags', 'categories')
+            ]
+            endpoint_list += [
+                ('system_batch_add', 'POST', '/api/v1/system/article/article_data/batch_add',
+                 {'data': article_data}),
+                ('system_update_category_rank', 'POST', '/api/v1/system/article/article_data/update_category_rank',
+                 {'data': {'category_name': category_slug, 'rank': rank.rank if rank else []}}),
+            ]
+        return [{'name': name, 'method': method, 'url': url, 'data': data}
+                for name, method, url, data in endpoint_list]
+
+    def request(self, endpoint):
+        if endpoint['method'] == 'POST':
+            return self.client.post(endpoint['url'], data=json.dumps(endpoint['data']),
+                                    content_type='application/json')
+        return self.client.get(endpoint['url'])
+
+    def clear_cache(self):
+        cache.clear()
+        local_cache.clear()
+        for index in list(LocalIndex.instances):
+            if self.cold_indexes:
+                index.reset()
+            elif index.loaded:
+                # 版本号随缓存一起被清空, 重新写入以免触发重建
+                index.bump()
+
+    def bench(self, endpoint, mode, iterations):
+        timings = []
+        query_counts = []
+        status_codes = set()
+        # 热缓存先请求一次
+        if mode == 'warm':
+            self.request(endpoint)
+        for _ in range(iterations):
+            if mode == 'cold':
+                self.clear_cache()
+            with CaptureQueriesContext(connection) as ctx:
+                started_at = time.perf_counter()
+                response = self.request(endpoint)
+                timings.append((time.perf_counter() - started_at) * 1000)
+            query_counts.append(len(ctx.captured_queries))
+            status_codes.add(response.status_code)
+
+        # tracemalloc 会拖慢请求, 单独请求一次统计峰值内存
+        if mode == 'cold':
+            self.clear_cache()
+        tracemalloc.start()
+        try:
+            self.request(endpoint)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        timings.sort()
+        return {
+            'iterations': iterations,
+            'status': sorted(status_codes),
+            'p50': round(percentile(timings, 0.5), 3),
+            'p95': round(percentile(timings, 0.95), 3),
+            'p99': round(percentile(timings, 0.99), 3),
+            'mean': round(sum(timings) / len(timings), 3),
+            'queries': round(sum(query_counts) / len(query_counts), 2),
+            'peak_memory': peak_memory,
+        }
+
+    def get_meta(self, iterations):
+        return {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'cache': settings.CACHES['default']['BACKEND'],
+            'article_count': article_models.Article.objects.count(),
+            'iterations': iterations,
+            'argv': sys.argv[1:],
+        }
+
+    def compare(self, base, report):
+        """
+        按接口对比 p50 / p95 / SQL 数量, 输出到 stderr
+        """
+        base_map = {item['name']: item for item in base['endpoint_list']}
+        self.stderr.write(f'{"endpoint":<32}{"mode":<6}{"p50":>20}{"p95":>20}{"queries":>16}')
+        for item in report['endpoint_list']:
+            base_item = base_map.get(item['name'])
+            if base_item is None:
+                continue
+            for mode in MODES:
+                before, after = base_item[mode], item[mode]
+                columns = [f'{before[key]}->{after[key]}' for key in ('p50', 'p95', 'queries')]
+                self.stderr.write(f'{item["name"]:<32}{mode:<6}{columns[0]:>20}{columns[1]:>20}{columns[2]:>16}')
@@ -0,0 +1,67 @@
+"""
+JSON 渲染压测
+
+对比 djangorestframework_camel_case 与 utils.renderers 的 CamelCaseJSONRenderer,
+校验输出逐字节一致并输出每次渲染耗时(ms), 结果为 JSON
+请求时绕过接口缓存与整页缓存, 取视图返回的原始数据
+
+    python manage.py bench_renderer --iterations 50
+"""
+
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.conf import settings
+from djangorestframework_camel_case.render import CamelCaseJSONRenderer as LibraryRenderer
+
+from utils import renderers
+from utils.cache import bypass_cache
+from article import models as article_models
+
+URL_LIST = (
+    '/api/v1/article/page/index',
+    '/api/v1/article/data/q?size=200',
+    '/api/v1/article/data/c/{category_slug}?size=200',
+    '/api/v1/system/article/article_data?size=200',
+    '/api/v1/system/page/sitemap',
+)
+
+
+class Command(BaseCommand):
+    help = 'JSON 渲染压测, 输出 JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+
+    def handle(self, *args, **options):
+        category_slug = article_models.CategoryGroupRank.objects.order_by('id').values_list('slug', flat=True).first()
+        if category_slug is None:
+            raise CommandError('没有分类排行数据, 先执行 generate_catalog')
+
+        client = Client(HTTP_AUTHORIZATION=settings.AUTH_TOKEN)
+        renderer_map = {'library': LibraryRenderer(), 'project': renderers.CamelCaseJSONRenderer()}
+        result_list = []
+        for url in URL_LIST:
+            url = url.format(category_slug=category_slug)
+            with bypass_cache():
+                data = client.get(url).data
+            content_map = {name: renderer.render(data) for name, renderer in renderer_map.items()}
+            if content_map['library'] != content_map['project']:
+                raise CommandError(f'{url} 渲染结果不一致')
+
+            result = {'url': url, 'bytes': len(content_map['library'])}
+            for name, renderer in renderer_map.items():
+                started_at = time.perf_counter()
+                for _ in range(options['iterations']):
+                    renderer.render(data)
+                result[name] = round((time.perf_counter() - started_at) / options['iterations'] * 1000, 3)
+            result['speedup'] = round(result['library'] / result['project'], 2)
+            result_list.append(result)
+
+        self.stdout.write(json.dumps({
+            'orjson': renderers.orjson is not None,
+            'iterations': options['iterations'],
+            'url_list': result_list,
+        }, indent=2))
@@ -0,0 +1,177 @@
+"""
+生成压测用的模拟数据
+
+    python manage.py generate_catalog --size 100k --clear
+    SQLITE_PATH=/tmp/bench.sqlite3 python manage.py generate_catalog --size 10k --clear
+
+包含文章、标签、分类、分类排行(CategoryGroupRank)与搜索广告信息(SearchAdInfo),
+同一 --seed 生成的数据相同
+"""
+
+import time
+import random
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.text import slugify
+
+from utils.cache import bump
+from utils.local_index import LocalIndex
+from article import models as article_models
+from article.search import build_keywords
+
+SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+WORDS = (
+    'car', 'truck', 'suv', 'bike', 'boat', 'tire', 'brake', 'oil', 'engine', 'battery', 'insurance', 'warranty',
+    'donation', 'charity', 'repair', 'service', 'roof', 'plumbing', 'hvac', 'furnace', 'window', 'door', 'garage',
+    'security', 'flooring', 'carpet', 'printing', 'payroll', 'marketing', 'seniors', 'budget', 'luxury', 'electric',
+    'hybrid', 'guide', 'tips', 'deals', 'sale', 'local', 'online', 'modern', 'home', 'office', 'family', 'travel',
+)
+
+
+@contextmanager
+def keep_update_time():
+    """
+    bulk_create 时保留指定的 update_time, 不被 auto_now 覆盖
+    """
+    field = article_models.Article._meta.get_field('update_time')
+    field.auto_now = False
+    try:
+        yield
+    finally:
+        field.auto_now = True
+
+
+class Command(BaseCommand):
+    help = '生成压测用的模拟数据'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=SIZES, default='10k', help='文章数量')
+        parser.add_argument('--articles', type=int, help='文章数量, 优先于 --size')
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--tags', type=int, default=500)
+        parser.add_argument('--ranks', type=int, default=20, help='有排行的分类数量')
+        parser.add_argument('--ad-infos', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--clear', action='store_true', help='先清空已有数据')
+
+    def handle(self, *args, **options):
+        article_count = options['articles'] or SIZES[options['size']]
+        if options['ranks'] > options['categories']:
+            raise CommandError('--ranks 不能大于 --categories')
+        rng = random.Random(options['seed'])
+        started_at = time.monotonic()
+        # 清空的数据同样需要通知缓存失效
+        cleared_values = self.get_dependency_values()
+
+        if options['clear']:
+            self.clear()
+        elif article_models.Article.objects.exists():
+            raise CommandError('已有文章数据, 使用 --clear 清空后生成')
+
+        tag_list = self.create_tags(options['tags'])
+        category_list = self.create_categories(options['categories'])
+        self.create_articles(rng, article_count, tag_list, category_list, options['batch_size'])
+        self.create_ranks(rng, category_list[:options['ranks']])
+        self.create_ad_infos(rng, options['ad_infos'])
+
+        # 数据不经过 articles_changed, 直接通知全部缓存与进程内索引失效
+        bump('catalog')
+        for namespace, values in self.get_dependency_values().items():
+            values = sorted(values | cleared_values[namespace])
+            for start in range(0, len(values), options['batch_size']):
+                bump(namespace, *values[start:start + options['batch_size']])
+        for index in list(LocalIndex.instances):
+            index.reset()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{article_count} articles, {len(tag_list)} tags, {len(category_list)} categories '
+            f'in {time.monotonic() - started_at:.1f}s ({settings.DATABASES["default"]["ENGINE"]})'))
+
+    def get_dependency_values(self):
+        """
+        各依赖命名空间下的全部值, 见 utils.cache.bump
+        """
+        return {
+            'article': set(article_models.Article.objects.values_list('uid', flat=True).iterator()),
+            'category': set(article_models.Category.objects.values_list('slug', flat=True)),
+            'ad': set(article_models.SearchAdInfo.objects.values_list('uid', flat=True)),
+        }
+
+    def clear(self):
+        with transaction.atomic():
+            for model in (article_models.Article.tags.through, article_models.Article.categories.through,
+                          article_models.Article, article_models.Tag, article_models.Category,
+                          article_models.CategoryGroupRank, article_models.SearchAdInfo):
+                model.objects.all().delete()
+
+    def create_tags(self, count):
+        article_models.Tag.objects.bulk_create([
+            article_models.Tag(name=f'{WORDS[index % len(WORDS)]} {index}') for index in range(count)])
+        return list(article_models.Tag.objects.order_by('id').values_list('id', 'name'))
+
+    def create_categories(self, count):
+        names = [f'{WORDS[index % len(WORDS)].title()} {index}' for index in range(count)]
+        article_models.Category.objects.bulk_create([
+            article_models.Category(name=name, slug=slugify(name)) for name in names])
+        return list(article_models.Category.objects.order_by('id').values_list('id', 'slug', 'name'))
+
+    def create_articles(self, rng, count, tag_list, category_list, batch_size):
+        tag_through = article_models.Article.tags.through
+        category_through = article_models.Article.categories.through
+        now = datetime.now()
+        for start in range(0, count, batch_size):
+            article_list = []
+            tag_rows = []
+            category_rows = []
+            for index in range(start, min(start + batch_size, count)):
+                uid = f'b{index:07d}'
+                title_words = rng.sample(WORDS, 5)
+                tags = rng.sample(tag_list, min(3, len(tag_list)))
+                # 分类大小不均匀, 前面的分类文章更多
+                categories = {category_list[int(rng.paretovariate(1.2) - 1) % len(category_list)]}
+                title = ' '.join(title_words).title()
+                article_list.append(article_models.Article(
+                    uid=uid,
+                    title=title,
+                    slug=f'{slugify(title)}-{index}',
+                    description=' '.join(rng.choices(WORDS, k=30)),
+                    content=' '.join(rng.choices(WORDS, k=300)),
+                    cover_img=f'bench/{uid}.jpg',
+                    referrer_ad_creative='',
+                    keywords=build_keywords([name for _, name in tags], [name for _, _, name in categories]),
+                    update_time=now - timedelta(seconds=rng.randrange(365 * 24 * 3600)),
+                ))
+                tag_rows += [tag_through(article_id=uid, tag_id=tag_id) for tag_id, _ in tags]
+                category_rows += [category_through(article_id=uid, category_id=category_id)
+                                  for category_id, _, _ in categories]
+            with transaction.atomic(), keep_update_time():
+                article_models.Article.objects.bulk_create(article_list)
+                tag_through.objects.bulk_create(tag_rows)
+                category_through.objects.bulk_create(category_rows)
+            self.stdout.write(f'{start + len(article_list)}/{count}')
+
+    def create_ranks(self, rng, category_list):
+        rank_list = []
+        for category_id, slug, _ in category_list:
+            uid_list = list(article_models.Article.categories.through.objects.filter(
+                category_id=category_id).values_list('article_id', flat=True)[:500])
+            if uid_list:
+                rank = rng.sample(uid_list, min(7, len(uid_list)))
+                rank_list.append(article_models.CategoryGroupRank(slug=slug, rank=rank))
+        article_models.CategoryGroupRank.objects.bulk_create(rank_list)
+
+    def create_ad_infos(self, rng, count):
+        article_models.SearchAdInfo.objects.bulk_create([
+            article_models.SearchAdInfo(
+                uid=f's{index:07d}',
+                terms=', '.join(rng.sample(WORDS, 4)),
+                channel_id=f'channel-{index % 10}',
+            )
+            for index in range(count)
+        ])
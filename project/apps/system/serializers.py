@@ -12,6 +12,13 @@ class ArticleDataSearchAdInfoSerializer(serializers.ModelSerializer):
         fields = ('uid', 'terms', 'channel_id')
 
 
+class DiscussionLinkDataSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = article_models.DiscussionLink
+        fields = ('id', 'sai_id', 'article_slug')
+        read_only_fields = ('id',)
+
+
 class WoogleSheetDataSerializer(serializers.ModelSerializer):
     uuid = serializers.SerializerMethodField()
 
@@ -0,0 +1,146 @@
+"""
+站点地图
+
+文章只读取 uid 与 update_time, 分批流式读取
+每个分片最多 SITEMAP_MAX_URLS 条, 超出时通过站点地图索引拆分
+分类与 lastmod 均取自数据
+
+get_sitemap_part(1) -> [{'url': '/', 'changefreq': 'weekly', 'priority': 1, 'lastmod': '...'}, ...]
+"""
+
+import os
+import gzip
+import math
+from xml.sax.saxutils import escape
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+
+from article import models as article_models
+
+SITEMAP_MAX_URLS = 50000
+LASTMOD_FORMAT = '%Y-%m-%dT%H:%M:%S+00:00'
+
+
+def format_lastmod(value):
+    if value is None:
+        value = timezone.now()
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value.astimezone(dt_timezone.utc).strftime(LASTMOD_FORMAT)
+
+
+def get_head_urls():
+    """
+    首页、搜索页与分类页
+    """
+    latest_update_time = article_models.Article.objects.aggregate(lastmod=Max('update_time'))['lastmod']
+    url_list = [
+        {'url': '/', 'changefreq': 'weekly', 'priority': 1, 'lastmod': format_lastmod(latest_update_time)},
+        {'url': '/q', 'changefreq': 'weekly', 'priority': 1, 'lastmod': format_lastmod(latest_update_time)},
+    ]
+    category_rows = article_models.Category.objects.annotate(lastmod=Max('articles__update_time')).filter(
+        lastmod__isnull=False).order_by('id').values_list('slug', 'lastmod')
+    for slug, lastmod in category_rows:
+        url_list.append({'url': f'/c/{slug}', 'changefreq': 'weekly', 'priority': 0.9,
+                         'lastmod': format_lastmod(lastmod)})
+    return url_list
+
+
+def iter_article_urls(offset=0, limit=None, route='article'):
+    article_rows = article_models.Article.objects.order_by('uid').values_list('uid', 'update_time')
+    end = None if limit is None else offset + limit
+    for uid, update_time in article_rows[offset:end].iterator(chunk_size=settings.SITEMAP_CHUNK_SIZE):
+        yield {'url': f'/{route}/{uid}', 'changefreq': 'daily', 'priority': 0.6,
+               'lastmod': format_lastmod(update_time)}
+
+
+def get_part_count(head_count=None):
+    if head_count is None:
+        head_count = len(get_head_urls())
+    total = head_count + article_models.Article.objects.count()
+    return max(1, math.ceil(total / SITEMAP_MAX_URLS))
+
+
+def iter_sitemap_part(index, head_urls=None):
+    """
+    第 index 个分片(从 1 开始), 首个分片以首页与分类页开头
+    """
+    if head_urls is None:
+        head_urls = get_head_urls()
+    start = (index - 1) * SITEMAP_MAX_URLS
+    end = start + SITEMAP_MAX_URLS
+    if start < len(head_urls):
+        yield from head_urls[start:end]
+    article_start = max(0, start - len(head_urls))
+    yield from iter_article_urls(article_start, max(0, end - len(head_urls) - article_start))
+
+
+def get_sitemap_part(index):
+    return list(iter_sitemap_part(index))
+
+
+def get_sitemap():
+    """
+    完整站点地图, 不分片
+    """
+    url_list = get_head_urls()
+    url_list.extend(iter_article_urls())
+    return url_list
+
+
+def get_part_file_name(index):
+    """
+    分片文件名, 与 write_sitemap_files 生成的文件一致
+    """
+    return f'sitemap-{index}.xml.gz'
+
+
+def get_sitemap_index():
+    """
+    站点地图索引
+    """
+    head_urls = get_head_urls()
+    lastmod = head_urls[0]['lastmod']
+    return [
+        {'url': f'/{get_part_file_name(index)}', 'lastmod': lastmod}
+        for index in range(1, get_part_count(len(head_urls)) + 1)
+    ]
+
+
+def write_sitemap_files(directory=None):
+    """
+    生成 gzip 压缩的 XML 站点地图分片与索引文件
+    """
+    directory = directory or settings.SITEMAP_DIR
+    os.makedirs(directory, exist_ok=True)
+    head_urls = get_head_urls()
+    part_count = get_part_count(len(head_urls))
+    # 条目地址以 / 开头
+    base_url = settings.BASE_URL.rstrip('/')
+
+    for index in range(1, part_count + 1):
+        path = os.path.join(directory, get_part_file_name(index))
+        with gzip.open(f'{path}.tmp', 'wt', encoding='utf-8') as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                    '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+            for item in iter_sitemap_part(index, head_urls):
+                f.write(f'<url><loc>{escape(base_url + item["url"])}</loc>'
+                        f'<lastmod>{item["lastmod"]}</lastmod>'
+                        f'<changefreq>{item["changefreq"]}</changefreq>'
+                        f'<priority>{item["priority"]}</priority></url>\n')
+            f.write('</urlset>\n')
+        os.replace(f'{path}.tmp', path)
+
+    path = os.path.join(directory, 'sitemap.xml')
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+        for index in range(1, part_count + 1):
+            f.write(f'<sitemap><loc>{escape(base_url)}/{get_part_file_name(index)}</loc>'
+                    f'<lastmod>{head_urls[0]["lastmod"]}</lastmod></sitemap>\n')
+        f.write('</sitemapindex>\n')
+    os.replace(f'{path}.tmp', path)
+    return part_count
@@ -0,0 +1,48 @@
+"""
+异步任务
+
+- 大批量写入按 INGEST_CHUNK_SIZE 分块, 每块一个任务, 进度见 system.jobs
+- 预生成站点地图文件, 可通过 django_celery_beat 定时执行
+"""
+
+from django.conf import settings
+
+from project.celery_app import app
+from utils.logger import log
+from system import jobs
+from system import sitemap
+from system.ingest import chunked, ingest_articles, ingest_search_ad_infos
+
+INGEST_FUNCTIONS = {
+    'article': ingest_articles,
+    'search_ad_info': ingest_search_ad_infos,
+}
+
+
+@app.task
+def ingest_chunk_task(job_id, index, kind, data):
+    jobs.set_chunk(job_id, index, jobs.CHUNK_RUNNING)
+    try:
+        success_uid_list, error_uid_list = INGEST_FUNCTIONS[kind](data)
+    except Exception as e:
+        log.exception(e)
+        jobs.set_chunk(job_id, index, jobs.CHUNK_FAILED,
+                       error_uid_list=[item.get('uid') for item in data if isinstance(item, dict)])
+        return
+    jobs.set_chunk(job_id, index, jobs.CHUNK_SUCCESS, success_uid_list, error_uid_list)
+
+
+def enqueue_ingest(kind, data):
+    """
+    分块投递写入任务, 返回任务 id
+    """
+    chunk_list = list(chunked(data, settings.INGEST_CHUNK_SIZE))
+    job_id = jobs.create_job(kind, len(chunk_list), len(data))
+    for index, chunk in enumerate(chunk_list):
+        ingest_chunk_task.delay(job_id, index, kind, chunk)
+    return job_id
+
+
+@app.task
+def generate_sitemap_task():
+    return sitemap.write_sitemap_files()
@@ -0,0 +1,124 @@
+import os
+import re
+import json
+import tempfile
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from utils.local_cache import local_cache
+from article import models as article_models
+from system import jobs
+from system import sitemap
+from system.tasks import enqueue_ingest
+from system.ingest import ingest_articles
+
+
+def article_info(uid, **kwargs):
+    return {
+        'uid': uid, 'title': f'Title {uid}', 'description': '', 'content': 'x', 'cover_img': '',
+        'tags': [{'name': 'car'}], 'categories': [{'name': 'Repair'}], **kwargs
+    }
+
+
+class IngestArticlesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+
+    def test_null_slugs_in_one_chunk(self):
+        success_uid_list, error_uid_list = ingest_articles([
+            article_info('n1', slug=None), article_info('n2', slug=None), article_info('n3')])
+        self.assertEqual(success_uid_list, ['n1', 'n2', 'n3'])
+        self.assertEqual(error_uid_list, [])
+        self.assertEqual(article_models.Article.objects.filter(slug__isnull=True).count(), 3)
+
+    def test_slug_taken_by_other_article(self):
+        ingest_articles([article_info('a1', slug='same-slug')])
+        success_uid_list, error_uid_list = ingest_articles([
+            article_info('a2', slug='same-slug'), article_info('a3', slug='other-slug')])
+        self.assertEqual(success_uid_list, ['a3'])
+        self.assertEqual(error_uid_list, ['a2'])
+
+
+@override_settings(CELERY_TASK_ALWAYS_EAGER=True, INGEST_CHUNK_SIZE=2, AUTH_TOKEN='test-token')
+class IngestJobTest(TestCase):
+    """
+    异步写入, 任务在当前进程同步执行
+    """
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+
+    def request(self, method, url, data=None):
+        response = getattr(self.client, method)(url, data=data, content_type='application/json',
+                                                HTTP_AUTHORIZATION='test-token')
+        return response.status_code, json.loads(response.content) if response.content else None
+
+    def test_enqueue_ingest(self):
+        job_id = enqueue_ingest('article', [article_info('a1'), article_info('a2'), article_info('bad', title=1)])
+        job = jobs.get_job(job_id)
+        self.assertTrue(job['finished'])
+        self.assertEqual(job['chunk_count'], 2)
+        self.assertEqual(job['total'], 3)
+        self.assertEqual(job['create_success_uid_list'], ['a1', 'a2'])
+        self.assertEqual(job['create_error_uid_list'], ['bad'])
+        self.assertEqual(article_models.Article.objects.count(), 2)
+
+    def test_job_status(self):
+        job_id = enqueue_ingest('article', [article_info('a1')])
+        status_code, content = self.request('get', f'/api/v1/system/job/{job_id}')
+        self.assertEqual(status_code, 200)
+        self.assertEqual(content['data']['jobId'], job_id)
+        self.assertTrue(content['data']['finished'])
+        self.assertEqual(content['data']['createSuccessUidList'], ['a1'])
+
+    def test_unknown_job(self):
+        status_code, _ = self.request('get', '/api/v1/system/job/unknown')
+        self.assertEqual(status_code, 404)
+
+    def test_async_batch_add(self):
+        status_code, content = self.request('post', '/api/v1/system/article/article_data/batch_add?async=1',
+                                            {'data': [article_info('a1'), article_info('a2'), article_info('a3')]})
+        self.assertEqual(status_code, 200)
+        job = jobs.get_job(content['data']['jobId'])
+        self.assertTrue(job['finished'])
+        self.assertEqual(job['create_success_uid_list'], ['a1', 'a2', 'a3'])
+        self.assertEqual(article_models.Article.objects.filter(uid__in=['a1', 'a2', 'a3']).count(), 3)
+
+
+@mock.patch.object(sitemap, 'SITEMAP_MAX_URLS', 5)
+class SitemapTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ingest_articles([article_info(f'u{index:02d}') for index in range(12)])
+
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+
+    def get_json(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_index_parts_can_be_fetched(self):
+        index_list = self.get_json('/api/v1/system/page/sitemap/index')
+        # 首页、搜索页、一个分类与 12 篇文章
+        self.assertEqual(len(index_list), 3)
+        url_list = []
+        for item in index_list:
+            index = re.fullmatch(r'/sitemap-(\d+)\.xml\.gz', item['url']).group(1)
+            part = self.get_json(f'/api/v1/system/page/sitemap/{index}')
+            self.assertTrue(0 < len(part) <= 5)
+            url_list += [part_item['url'] for part_item in part]
+        self.assertEqual(url_list, [item['url'] for item in self.get_json('/api/v1/system/page/sitemap')])
+        self.assertEqual(self.client.get('/api/v1/system/page/sitemap/4').status_code, 404)
+
+    def test_index_matches_written_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sitemap.write_sitemap_files(directory)
+            for item in sitemap.get_sitemap_index():
+                self.assertTrue(os.path.exists(os.path.join(directory, item['url'].lstrip('/'))))
@@ -5,7 +5,11 @@ from system import views as system_views
 from . import views
 
 urlpatterns = [path('page/sitemap', views.SitemapPageView.as_view()),
-                path('woogle-sheet-data', views.GetWoogleSheetDataView.as_view())
+                path('page/sitemap/index', views.SitemapIndexPageView.as_view()),
+                path('page/sitemap/<int:index>', views.SitemapPartPageView.as_view()),
+                path('woogle-sheet-data', views.GetWoogleSheetDataView.as_view()),
+                path('job/<str:job_id>', views.IngestJobView.as_view()),
+                path('metrics', views.MetricsView.as_view()),
                ]
 
 router = SimpleRouter(trailing_slash=False)
@@ -13,4 +17,5 @@ router = SimpleRouter(trailing_slash=False)
 # 文章管理发布到站
 router.register('article/article_data', system_views.ArticleDataViewSet, basename='site_data')
 router.register('article/search_ad_info_data', system_views.SearchAdInfoDataViewSet, basename='site_data')
+router.register('article/discussion_link_data', system_views.DiscussionLinkDataViewSet, basename='site_data')
 urlpatterns += router.urls
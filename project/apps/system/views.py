@@ -1,5 +1,4 @@
 import json
-from datetime import datetime
 import os
 import logging
 from rest_framework import status
@@ -7,18 +6,28 @@ from django.utils.text import slugify
 from django.utils.decorators import method_decorator
 from rest_framework.decorators import action, APIView
 from django.conf import settings
-from rest_framework_extensions.cache.decorators import cache_response
 from settings import LOG_DIR
 from rest_framework.response import Response
+from utils.cache import bump, cache_response
+from utils.metrics import metrics
+from utils.local_cache import local_cache
 from utils.response import APIResponse
 from utils.viewsets import ModelViewSet
 from utils.pagination import APIPageNumberPagination
+from utils.projection import project
 
 from article import models as article_models
-from article import serializers as article_serializers
+from article import signals as article_signals
+from article.ranks import category_ranks
+from article.discussion import discussion_links
+from article.ad_terms import ad_term_index
 from system import filters as system_filters
 from system import decorators as system_decorators
 from system import serializers as system_serializers
+from system import jobs
+from system import sitemap
+from system.ingest import ingest_articles, ingest_search_ad_infos
+from system.tasks import enqueue_ingest
 
 
 @method_decorator(system_decorators.api_auth, name='dispatch')
@@ -29,58 +38,31 @@ class ArticleDataViewSet(ModelViewSet):
     pagination_class = APIPageNumberPagination
     ordering_fields = ('rank', 'create_time', 'update_time')
 
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        article_signals.articles_changed.send(sender=article_models.Article, uids=[serializer.instance.uid])
+
+    def perform_update(self, serializer):
+        category_ids = list(serializer.instance.categories.values_list('id', flat=True))
+        super().perform_update(serializer)
+        article_signals.articles_changed.send(sender=article_models.Article, uids=[serializer.instance.uid],
+                                              category_ids=category_ids)
+
+    def perform_destroy(self, instance):
+        uid = instance.uid
+        category_ids = list(instance.categories.values_list('id', flat=True))
+        super().perform_destroy(instance)
+        article_signals.articles_changed.send(sender=article_models.Article, uids=[uid], category_ids=category_ids)
+
     @action(methods=['post'], detail=False)
     def batch_add(self, request):
         data = request.data.get('data')
 
-        create_success_uid_list = []
-        create_error_uid_list = []
-
-        for article_info in data:
-            try:
-                tags = article_info.pop('tags', [])
-                categories = article_info.pop('categories', [])
-
-                article_obj = article_models.Article.objects.update_or_create(
-                    uid=article_info.get('uid'),
-                    defaults={
-                        'update_time': datetime.now(),
-                        'title': article_info.get('title', ''),
-                        'slug':article_info.get('slug', ''),
-                        'description': article_info.get('description', ''),
-                        'content': article_info.get('content', ''),
-                        'cover_img': article_info.get('cover_img', ''),
-                        'referrer_ad_creative': article_info.get('referrer_ad_creative', ''),
-
-                    }
-                )[0]
-
-                article_obj.tags.clear()
-                for tag in tags:
-                    tag_name = tag.get('name')
-                    tag_obj = article_models.Tag.objects.get_or_create(
-                        name=tag_name,
-                        defaults={
-                            'name': tag_name
-                        }
-                    )[0]
-                    article_obj.tags.add(tag_obj)
-
-                article_obj.categories.clear()
-                for category in categories:
-                    category_name = category.get('name')
-                    category_obj = article_models.Category.objects.get_or_create(
-                        name=category_name,
-                        defaults={
-                            'name': category_name
-                        }
-                    )[0]
-                    article_obj.categories.add(category_obj)
-                article_obj.save()
-                create_success_uid_list.append(article_info.get('uid'))
-            except Exception as e:
-                print(e)
-                create_error_uid_list.append(article_info.get('uid'))
+        if request.query_params.get('async'):
+            job_id = enqueue_ingest('article', data)
+            return APIResponse(data={'job_id': job_id}, status=status.HTTP_200_OK, msg='success')
+
+        create_success_uid_list, create_error_uid_list = ingest_articles(data)
         data = {
             'create_success_uid_list': create_success_uid_list,
             'create_error_uid_list': create_error_uid_list
@@ -102,6 +84,8 @@ class ArticleDataViewSet(ModelViewSet):
                 'rank': rank
             }
         )
+        category_ranks.update(slug)
+        bump('category', slug)
 
         return APIResponse(status=status.HTTP_200_OK, msg='success')
 
@@ -111,17 +95,42 @@ class SearchAdInfoDataViewSet(ModelViewSet):
     queryset = article_models.SearchAdInfo.objects.all()
     serializer_class = system_serializers.ArticleDataSearchAdInfoSerializer
 
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        article_signals.search_ad_infos_changed.send(sender=article_models.SearchAdInfo,
+                                                     uids=[serializer.instance.uid])
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        article_signals.search_ad_infos_changed.send(sender=article_models.SearchAdInfo,
+                                                     uids=[serializer.instance.uid])
+
+    def perform_destroy(self, instance):
+        uid = instance.uid
+        super().perform_destroy(instance)
+        article_signals.search_ad_infos_changed.send(sender=article_models.SearchAdInfo, uids=[uid])
+
+    @action(methods=['get'], detail=False)
+    def lookup(self, request):
+        """
+        按关键词反查广告信息
+        """
+        term = request.query_params.get('term', '')
+        data = {
+            'term': term,
+            'sai_id_list': ad_term_index.lookup(term),
+        }
+        return APIResponse(data=data, status=status.HTTP_200_OK)
+
     @action(methods=['post'], detail=False)
     def batch_add(self, request):
         data = request.data
-        create_success_uid_list = []
-        create_error_uid_list = []
-        for ad_info in data:
-            try:
-                article_models.SearchAdInfo.objects.create(**ad_info)
-                create_success_uid_list.append(ad_info.get('uid'))
-            except Exception as e:
-                create_error_uid_list.append(ad_info.get('uid'))
+
+        if request.query_params.get('async'):
+            job_id = enqueue_ingest('search_ad_info', data)
+            return APIResponse(data={'job_id': job_id}, status=status.HTTP_200_OK, msg='success')
+
+        create_success_uid_list, create_error_uid_list = ingest_search_ad_infos(data)
         data = {
             'create_success_uid_list': create_success_uid_list,
             'create_error_uid_list': create_error_uid_list,
@@ -130,66 +139,93 @@ class SearchAdInfoDataViewSet(ModelViewSet):
         return APIResponse(data=data, status=status.HTTP_200_OK, msg='success')
 
 
+@method_decorator(system_decorators.api_auth, name='dispatch')
+class DiscussionLinkDataViewSet(ModelViewSet):
+    """
+    讨论页推荐文章
+    """
+    queryset = article_models.DiscussionLink.objects.order_by('id')
+    serializer_class = system_serializers.DiscussionLinkDataSerializer
+
+    def discussion_links_changed(self):
+        # 讨论页不缓存整个响应, 各进程在后台重建推荐链接即可
+        discussion_links.invalidate()
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self.discussion_links_changed()
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self.discussion_links_changed()
+
+    def perform_destroy(self, instance):
+        super().perform_destroy(instance)
+        self.discussion_links_changed()
+
+
+@method_decorator(system_decorators.api_auth, name='dispatch')
+class IngestJobView(APIView):
+    """
+    异步写入任务进度
+    """
+
+    def get(self, request, job_id):
+        job = jobs.get_job(job_id)
+        if job is None:
+            return APIResponse(status=status.HTTP_404_NOT_FOUND)
+        return APIResponse(data=job, status=status.HTTP_200_OK)
+
+
+@method_decorator(system_decorators.api_auth, name='dispatch')
+class MetricsView(APIView):
+    """
+    接口性能统计(当前进程)
+    """
+
+    def get(self, request):
+        data = {**metrics.snapshot(), 'local_cache': local_cache.stats()}
+        return APIResponse(data=data, status=status.HTTP_200_OK)
+
+
 class GetWoogleSheetDataView(APIView):
 
     def post(self, request):
         data = request.data
-        article_list = article_models.Article.objects.filter(uid__in=data)
+        article_list = project(article_models.Article.objects.filter(uid__in=data),
+                               system_serializers.WoogleSheetDataSerializer)
         article_list_data = system_serializers.WoogleSheetDataSerializer(article_list, many=True).data
         return APIResponse(data=article_list_data, status=status.HTTP_200_OK)
 
 
 class SitemapPageView(APIView):
+    """
+    完整站点地图, 分片见 SitemapIndexPageView / SitemapPartPageView
+    """
+
     def cache_key(self, view_instance, view_method, request, args, kwargs):
         return f'backend:seniorassist:sitemap'
 
-    @cache_response(timeout=settings.CACHE_TIME_SITEMAP, key_func='cache_key')
+    @cache_response(timeout=settings.CACHE_TIME_SITEMAP, key_func='cache_key', deps=('catalog',), early=True)
     def get(self, request):
-        article_objs = article_models.Article.objects.all()
-
-        sitemap = [
-            {
-                'url': '/',
-                'changefreq': 'weekly',
-                'priority': 1,
-                'lastmod': datetime.now()
-            },
-            {
-                'url': '/q',
-                'changefreq': 'weekly',
-                'priority': 1,
-                'lastmod': datetime.now()
-            },
-            {
-                'url': '/c/vehicle-donation',
-                'changefreq': 'weekly',
-                'priority': 0.9,
-                'lastmod': datetime.now()
-            },
-            {
-                'url': '/c/vehicle-plans',
-                'changefreq': 'weekly',
-                'priority': 0.9,
-                'lastmod': datetime.now()
-            },
-            {
-                'url': '/c/motor-vehicles',
-                'changefreq': 'weekly',
-                'priority': 0.9,
-                'lastmod': datetime.now()
-            },
-            {
-                'url': '/c/repair',
-                'changefreq': 'weekly',
-                'priority': 0.9,
-                'lastmod': datetime.now()
-            },
-
-        ]
-
-        article_sitemap_data = article_serializers.ArticleSitemapSerializer(
-            instance=article_objs, many=True, context={'route': 'article'}).data
-
-        sitemap = sitemap + article_sitemap_data
-
-        return Response(sitemap)
+        return Response(sitemap.get_sitemap())
+
+
+class SitemapIndexPageView(APIView):
+    def cache_key(self, view_instance, view_method, request, args, kwargs):
+        return f'backend:seniorassist:sitemap:index'
+
+    @cache_response(timeout=settings.CACHE_TIME_SITEMAP, key_func='cache_key', deps=('catalog',), early=True)
+    def get(self, request):
+        return Response(sitemap.get_sitemap_index())
+
+
+class SitemapPartPageView(APIView):
+    def cache_key(self, view_instance, view_method, request, args, kwargs):
+        return f'backend:seniorassist:sitemap:{kwargs.get("index")}'
+
+    @cache_response(timeout=settings.CACHE_TIME_SITEMAP, key_func='cache_key', deps=('catalog',), early=True)
+    def get(self, request, index):
+        if not 1 <= index <= sitemap.get_part_count():
+            return APIResponse(status=status.HTTP_404_NOT_FOUND)
+        return Response(sitemap.get_sitemap_part(index))
@@ -43,7 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.metrics.MetricsMiddleware',  # 接口性能统计
     'django.middleware.security.SecurityMiddleware',
+    'utils.page_cache.PageCacheMiddleware',  # 整页缓存
     'django.contrib.sessions.middleware.SessionMiddleware',
     # "corsheaders.middleware.CorsMiddleware",  # 跨域中间件
     'django.middleware.common.CommonMiddleware',
@@ -93,14 +95,15 @@ CORS_ORIGIN_ALLOW_ALL = True
 CORS_ALLOW_CREDENTIALS = True  # 指明在跨域访问中，后端是否支持对cookie的操作
 
 # ---------- DRF配置 ----------
+# utils.renderers.CamelCaseJSONRenderer 与 djangorestframework_camel_case 的输出一致, 见 bench_renderer
 if DEBUG:
     DEFAULT_RENDERER_CLASSES = (
-        'djangorestframework_camel_case.render.CamelCaseJSONRenderer',
+        'utils.renderers.CamelCaseJSONRenderer',
         'djangorestframework_camel_case.render.CamelCaseBrowsableAPIRenderer',
     )
 else:
     DEFAULT_RENDERER_CLASSES = (
-        'djangorestframework_camel_case.render.CamelCaseJSONRenderer',
+        'utils.renderers.CamelCaseJSONRenderer',
     )
 REST_FRAMEWORK = {
     # 时间格式配置
@@ -136,17 +139,30 @@ REST_FRAMEWORK_EXTENSIONS = {
     'DEFAULT_USE_CACHE': 'default',
 }
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        "NAME": env('MYSQL_DB'),
-        "HOST": "127.0.0.1",
-        "PORT": "3306",
-        "USER": "root",
-        "PASSWORD": env('MYSQL_PASSWORD'),
-        'OPTIONS': {'charset': 'utf8mb4'}
+# python manage.py test 使用 SQLite 与进程内缓存, 不依赖 MySQL / redis
+TESTING = sys.argv[1:2] == ['test']
+
+# 本地压测等场景使用 SQLite 文件, 为空时使用 MySQL
+SQLITE_PATH = env('SQLITE_PATH', default='')
+if SQLITE_PATH or TESTING:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': SQLITE_PATH or ':memory:',
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.mysql',
+            "NAME": env('MYSQL_DB'),
+            "HOST": "127.0.0.1",
+            "PORT": "3306",
+            "USER": "root",
+            "PASSWORD": env('MYSQL_PASSWORD'),
+            'OPTIONS': {'charset': 'utf8mb4'}
+        }
     }
-}
 
 CACHES = {
     "default": {
@@ -157,6 +173,17 @@ CACHES = {
         }
     }
 }
+if TESTING:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# ---------- Celery配置 ----------
+CELERY_BROKER_URL = env('CELERY_BROKER_URL', default='redis://127.0.0.1:6379/1')
+# 任务在当前进程同步执行, 测试时无需 broker
+CELERY_TASK_ALWAYS_EAGER = env.bool('CELERY_TASK_ALWAYS_EAGER', default=False)
 
 # ---------- 环境变量导出 ----------
 AUTH_TOKEN = env('AUTH_TOKEN', default='')
@@ -173,15 +200,67 @@ CACHE_TIME_SEARCH_AD = env('CACHE_TIME_SEARCH_AD', default=7200)
 CACHE_TIME_BLUE = env('CACHE_TIME_BLUE', default=7200)
 CACHE_TIME_RAIN = env('CACHE_TIME_RAIN', default=7200)
 CACHE_TIME_RED = env('CACHE_TIME_RED', default=7200)
+# 片段缓存时间, 依赖的数据变更后即失效, 见 utils.fragments
+CACHE_TIME_FRAGMENT = env.int('CACHE_TIME_FRAGMENT', default=60 * 60 * 24)
+# 接口缓存软过期后继续保留旧值的时间, 期间由一个请求重新计算, 其余请求返回旧值
+CACHE_STALE_TIMEOUT = env.int('CACHE_STALE_TIMEOUT', default=60 * 60)
+# 重新计算锁超时时间
+CACHE_LOCK_TIMEOUT = env.int('CACHE_LOCK_TIMEOUT', default=30)
+# 无旧值时等待持锁请求的次数, 每次 50ms
+CACHE_LOCK_WAIT_STEPS = env.int('CACHE_LOCK_WAIT_STEPS', default=10)
+# 各服务器时钟误差(秒), 渲染开始前这段时间内更新过的依赖同样视为渲染期间变更
+CACHE_CLOCK_SKEW = env.float('CACHE_CLOCK_SKEW', default=1)
+# 热点接口进程内缓存, 见 utils.local_cache
+LOCAL_CACHE_ENABLED = env.bool('LOCAL_CACHE_ENABLED', default=True)
+# 每个进程的缓存总大小(字节)
+LOCAL_CACHE_MAX_BYTES = env.int('LOCAL_CACHE_MAX_BYTES', default=32 * 1024 * 1024)
+# 进程内缓存保留时间(秒), 也是其他进程写入后的最大延迟
+LOCAL_CACHE_TIMEOUT = env.int('LOCAL_CACHE_TIMEOUT', default=5)
+# 公开接口整页缓存, 见 utils.page_cache
+PAGE_CACHE_ENABLED = env.bool('PAGE_CACHE_ENABLED', default=True)
+# 超过该字节数时同时保存 gzip 压缩内容; 项目依赖只包含 gzip, brotli 需在运行环境另行安装, 安装后另存 br
+PAGE_CACHE_GZIP_MIN_LENGTH = env.int('PAGE_CACHE_GZIP_MIN_LENGTH', default=1024)
 
 IMGPROXY_KEY = env('IMGPROXY_KEY', default='')
 IMGPROXY_SALT = env('IMGPROXY_SALT', default='')
+# 图片地址签名缓存数量
+IMGPROXY_CACHE_SIZE = env.int('IMGPROXY_CACHE_SIZE', default=10000)
 PROJ_IMG_BASE_URL = env('PROJ_IMG_BASE_URL', default='')
 PROJ_IMAGE_BASE_URL = env('PROJ_IMAGE_BASE_URL', default='')
 
 BASE_URL = env('BASE_URL', default='')
 IMG_BASE_URL = env('IMG_BASE_URL', default='')
 
+# 站点地图分批读取数量
+SITEMAP_CHUNK_SIZE = env.int('SITEMAP_CHUNK_SIZE', default=2000)
+# 预生成站点地图文件目录
+SITEMAP_DIR = env('SITEMAP_DIR', default=os.path.join(ROOT_DIR, 'sitemap'))
+
+# 接口性能统计, 见 utils.metrics
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=True)
+# 统计保留分钟数
+METRICS_WINDOW_COUNT = env.int('METRICS_WINDOW_COUNT', default=5)
+
+# 文章列表分页总数缓存时间, 文章写入后失效
+PAGINATION_COUNT_CACHE_TIMEOUT = env.int('PAGINATION_COUNT_CACHE_TIMEOUT', default=60 * 10)
+# 文章列表分页总数上限, 超出时返回 "10000+", 0 为精确计数
+PAGINATION_COUNT_CAP = env.int('PAGINATION_COUNT_CAP', default=0)
+
+# 全文检索后端, 为空时按数据库类型选择, 见 article.search
+SEARCH_BACKEND = env('SEARCH_BACKEND', default='')
+# 单次搜索最多返回结果数, 不匹配的文章不再出现在搜索结果中
+SEARCH_MAX_RESULTS = env.int('SEARCH_MAX_RESULTS', default=1000)
+# 搜索联想每类返回数量与上限, 见 article.suggest
+SUGGEST_SIZE = env.int('SUGGEST_SIZE', default=8)
+SUGGEST_MAX_SIZE = env.int('SUGGEST_MAX_SIZE', default=20)
+# 多个单词的搜索联想最多检查的候选数, 只影响召回, 不影响排序
+SUGGEST_SCAN_LIMIT = env.int('SUGGEST_SCAN_LIMIT', default=500)
+
+# 批量写入分块大小, 每块一个事务
+INGEST_CHUNK_SIZE = env.int('INGEST_CHUNK_SIZE', default=500)
+# 异步写入任务进度保留时间
+INGEST_JOB_TIMEOUT = env.int('INGEST_JOB_TIMEOUT', default=60 * 60 * 24)
+
 # ---------- 日志配置 ----------
 logger = logging.getLogger(__name__)
 LOG_DIR = os.path.join(ROOT_DIR, 'logs')
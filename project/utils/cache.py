@@ -0,0 +1,346 @@
+"""
+接口缓存
+
+替代 drf-extensions 的 cache_response, 额外记录每个缓存依赖的数据:
+视图执行期间通过 depend_on() 声明依赖(文章 uid / 分类 slug / 广告 id 等),
+写入数据时 bump() 对应依赖的版本号, 读缓存时版本不一致即视为失效
+
+    @cache_response(timeout=settings.CACHE_TIME_INDEX, key_func='cache_key', deps=('catalog',))
+    def get(self, request):
+        depend_on('category', slug)
+        ...
+
+    bump('article', *uids)
+
+版本号为 bump() 时的时间(纳秒): 静态依赖在渲染前读取, 渲染后版本变化或动态依赖在渲染期间 bump 过时不写入缓存,
+避免把渲染期间被修改的旧数据记为新版本
+
+热点接口可加 local=True, 在 redis 之前使用进程内缓存, 见 utils.local_cache
+公开接口可加 early=True, 命中时由中间件直接返回响应字节, 见 utils.page_cache
+"""
+
+import math
+import time
+import random
+import contextvars
+from contextlib import contextmanager
+from functools import wraps, WRAPPER_ASSIGNMENTS
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError
+from django.http.response import HttpResponse
+from django_redis.cache import RedisCache
+
+from utils.logger import log
+from utils.shortcuts import short_uuid
+from utils.metrics import record_cache
+from utils.local_cache import local_cache
+
+# 当前请求收集到的依赖 {依赖: 渲染前读取或使用的版本号, 动态依赖为 None}, 不在缓存视图中时为 None
+_dependencies = contextvars.ContextVar('cache_dependencies', default=None)
+# 同一次渲染使用了同一依赖的不同版本, 不与任何版本号相等
+CONFLICT = object()
+# 为 True 时不读写接口缓存与整页缓存, 见 bypass_cache
+_bypass = contextvars.ContextVar('cache_bypass', default=False)
+
+# 锁的值仍为自己的 token 时才删除
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def dependency_tag(namespace, value=None):
+    return namespace if value is None else f'{namespace}:{value}'
+
+
+def version_key(tag):
+    return f'backend:dep:{tag}'
+
+
+def depend_on(namespace, *values):
+    """
+    声明当前缓存依赖的数据, 不传 values 时依赖整个命名空间
+    """
+    dependencies = _dependencies.get()
+    if dependencies is None:
+        return
+    if not values:
+        dependencies.setdefault(dependency_tag(namespace), None)
+    for value in values:
+        dependencies.setdefault(dependency_tag(namespace, value), None)
+
+
+def _add_dependency(dependencies, tag, version):
+    if version is None:
+        dependencies.setdefault(tag, None)
+    elif dependencies.get(tag) is None:
+        dependencies[tag] = version
+    elif dependencies[tag] != version:
+        dependencies[tag] = CONFLICT
+
+
+def observe(tag, version):
+    """
+    声明当前缓存使用了该版本的数据(如进程内索引, 见 utils.local_index), 写入缓存时版本号必须仍一致
+    """
+    dependencies = _dependencies.get()
+    if dependencies is not None:
+        _add_dependency(dependencies, tag, version)
+
+
+def get_versions(tags, cache=None):
+    cache = cache or caches['default']
+    keys = {tag: version_key(tag) for tag in tags}
+    versions = cache.get_many(keys.values())
+    return {tag: versions.get(key, 0) for tag, key in keys.items()}
+
+
+def bump(namespace, *values, cache=None):
+    """
+    依赖的数据已变更, 更新版本号使相关缓存失效, 返回新版本号
+    """
+    cache = cache or caches['default']
+    tags = [dependency_tag(namespace)] if not values else [dependency_tag(namespace, value) for value in values]
+    local_cache.discard_tags(tags)
+    version = time.time_ns()
+    cache.set_many({version_key(tag): version for tag in tags}, None)
+    return version
+
+
+def is_recent(version, started_at):
+    """
+    版本号是否在 started_at(time.time()) 之后更新, 计入各服务器的时钟误差
+    旧版本号为自增整数, 视为很早之前
+    """
+    return isinstance(version, int) and version > (started_at - settings.CACHE_CLOCK_SKEW) * 1e9
+
+
+@contextmanager
+def collect_dependencies(versions=None):
+    """
+    收集代码块内声明的依赖, versions 为执行前已读取版本号的静态依赖
+    结束后并入外层(如缓存视图)收集到的依赖
+    """
+    dependencies = dict(versions or {})
+    token = _dependencies.set(dependencies)
+    try:
+        yield dependencies
+    finally:
+        _dependencies.reset(token)
+        outer = _dependencies.get()
+        if outer is not None:
+            for tag, version in dependencies.items():
+                _add_dependency(outer, tag, version)
+
+
+@contextmanager
+def bypass_cache():
+    """
+    代码块内 cache_response 直接执行视图, 整页缓存不生效, 供压测等需要视图原始响应(response.data)的场景
+    """
+    token = _bypass.set(True)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def is_cache_bypassed():
+    return _bypass.get()
+
+
+def get_stable_versions(dependencies, started_at, cache=None):
+    """
+    读取依赖的当前版本号, 用于写入缓存
+    静态依赖与执行前读取的版本不一致, 或动态依赖在 started_at 之后更新过时返回 None, 此时不应写入缓存
+    """
+    versions = get_versions(dependencies, cache)
+    for tag, version in versions.items():
+        expected = dependencies[tag]
+        if expected is None:
+            if is_recent(version, started_at):
+                return None
+        elif version != expected:
+            return None
+    return versions
+
+
+def release_lock(cache, key, token):
+    """
+    释放 cache.add(key, token) 获取的锁, 锁已超时并被其他请求获取时不删除
+    """
+    if isinstance(cache, RedisCache):
+        cache.client.get_client(write=True).eval(
+            RELEASE_LOCK_SCRIPT, 1, cache.client.make_key(key), cache.client.encode(token))
+    elif cache.get(key) == token:
+        cache.delete(key)
+
+
+class CacheResponse:
+    """
+    缓存渲染后的 HttpResponse 及其依赖的版本号
+
+    防击穿:
+    - timeout 为软过期时间, 之后 stale_timeout 内仍保留旧值
+    - 过期或依赖失效后只有抢到锁的请求重新计算, 其余请求返回旧值
+    - 重新计算时数据库异常, 返回旧值
+    - 临近过期时按概率提前重新计算(XFetch), 计算越慢越早
+    - 渲染期间依赖的数据变更时只返回响应, 不写入缓存
+    """
+    # 提前过期系数, 越大越早
+    early_expiration_beta = 1.0
+
+    def __init__(self, timeout=60 * 5, key_func=None, cache=None, deps=(), stale_timeout=None, local=False,
+                 early=False):
+        self.timeout = int(timeout)
+        self.key_func = key_func
+        # 静态依赖, 如 ('catalog',)
+        self.deps = deps
+        self.stale_timeout = settings.CACHE_STALE_TIMEOUT if stale_timeout is None else stale_timeout
+        self.cache = caches[cache or 'default']
+        # 使用进程内缓存
+        self.local = local and settings.LOCAL_CACHE_ENABLED
+        # 响应只由 URL 决定, 可由中间件直接返回, 见 utils.page_cache
+        self.early = early
+
+    def __call__(self, func):
+        this = self
+
+        @wraps(func, assigned=WRAPPER_ASSIGNMENTS)
+        def inner(self, request, *args, **kwargs):
+            return this.process_cache_response(
+                view_instance=self,
+                view_method=func,
+                request=request,
+                args=args,
+                kwargs=kwargs,
+            )
+
+        return inner
+
+    def process_cache_response(self, view_instance, view_method, request, args, kwargs):
+        if is_cache_bypassed():
+            return self.render_response(view_instance, view_method, request, args, kwargs)[0]
+
+        key = self.calculate_key(view_instance, view_method, request, args, kwargs)
+
+        if self.local:
+            entry = local_cache.get(key)
+            if entry is not None:
+                record_cache('hit')
+                return self.mark_page_cache(self.build_response(entry), entry)
+
+        entry = self.cache.get(key)
+        if entry is not None and not self.should_refresh(entry):
+            record_cache('hit')
+            if self.local:
+                local_cache.set(key, entry)
+            return self.mark_page_cache(self.build_response(entry), entry)
+
+        lock_key = f'{key}:lock'
+        lock_token = short_uuid()
+        if not self.cache.add(lock_key, lock_token, settings.CACHE_LOCK_TIMEOUT):
+            # 其他请求正在计算
+            if entry is not None:
+                record_cache('stale')
+                return self.build_response(entry)
+            entry = self.wait_for_entry(key)
+            if entry is not None:
+                record_cache('hit')
+                return self.build_response(entry)
+            record_cache('miss')
+            return self.render_response(view_instance, view_method, request, args, kwargs)[0]
+
+        record_cache('miss')
+        try:
+            try:
+                started_at = time.time()
+                response, dependencies = self.render_response(view_instance, view_method, request, args, kwargs)
+                versions = get_stable_versions(dependencies, started_at, self.cache)
+            except DatabaseError as e:
+                if entry is None:
+                    raise
+                log.exception(e)
+                record_cache('stale')
+                return self.build_response(entry)
+            if response.status_code < 400 and versions is not None:
+                entry = {
+                    'content': response.rendered_content,
+                    'status': response.status_code,
+                    'headers': dict(response.items()),
+                    'versions': versions,
+                    'expires': time.time() + self.timeout,
+                    'delta': time.time() - started_at,
+                }
+                self.cache.set(key, entry, self.timeout + self.stale_timeout)
+                if self.local:
+                    local_cache.set(key, entry)
+                self.mark_page_cache(response, entry)
+            return response
+        finally:
+            release_lock(self.cache, lock_key, lock_token)
+
+    def mark_page_cache(self, response, entry):
+        """
+        未过期的响应交给 utils.page_cache.PageCacheMiddleware 按 URL 缓存
+        """
+        if self.early:
+            response.page_cache = {'versions': entry['versions'], 'expires': entry['expires'], 'local': self.local}
+        return response
+
+    def should_refresh(self, entry):
+        """
+        软过期(含概率提前过期)或依赖失效
+        """
+        early = entry['delta'] * self.early_expiration_beta * -math.log(1 - random.random())
+        if time.time() + early >= entry['expires']:
+            return True
+        return not self.is_fresh(entry)
+
+    def wait_for_entry(self, key):
+        """
+        无旧值可用时短暂等待持锁请求写入缓存
+        """
+        for _ in range(settings.CACHE_LOCK_WAIT_STEPS):
+            time.sleep(0.05)
+            entry = self.cache.get(key)
+            if entry is not None:
+                return entry
+        return None
+
+    def render_response(self, view_instance, view_method, request, args, kwargs):
+        """
+        执行视图并收集依赖, 静态依赖在执行前读取版本号
+        """
+        with collect_dependencies(get_versions(self.deps, self.cache)) as dependencies:
+            response = view_method(view_instance, request, *args, **kwargs)
+            response = view_instance.finalize_response(request, response, *args, **kwargs)
+            response.render()
+        return response, dependencies
+
+    def is_fresh(self, entry):
+        return get_versions(entry['versions'], self.cache) == entry['versions']
+
+    def build_response(self, entry):
+        response = HttpResponse(content=entry['content'], status=entry['status'])
+        for header, value in entry['headers'].items():
+            response[header] = value
+        response._closable_objects = []
+        return response
+
+    def calculate_key(self, view_instance, view_method, request, args, kwargs):
+        key_func = getattr(view_instance, self.key_func) if isinstance(self.key_func, str) else self.key_func
+        return key_func(
+            view_instance=view_instance,
+            view_method=view_method,
+            request=request,
+            args=args,
+            kwargs=kwargs,
+        )
+
+
+cache_response = CacheResponse
@@ -0,0 +1,158 @@
+"""
+片段缓存
+
+按对象缓存序列化结果, 多个接口共用, 由片段组装响应, 替代按 URL 缓存整个响应
+片段记录生成时对象依赖的版本号(见 utils.cache.bump), 版本不一致即失效
+
+    ad_info_fragment = Fragment(SearchAdInfoSerializer, SearchAdInfo.objects.all(), namespace='ad')
+    article_fragment = Fragment(SearchArticleSerializer, Article.objects.all(), namespace='article', lookup_field='slug')
+
+    ad_info_data, article_data = get_fragments([(ad_info_fragment, uid), (article_fragment, slug)])
+
+一次 get_many 读取全部片段与已知的版本号, 按非主键查找的片段再读取一次版本号,
+未命中的片段每种一次查询; 写入时使用查询前读取的版本号, 查询前无法确定主键的对象在查询后读取,
+查询期间变更过的不写入缓存
+
+列表序列化使用 get_representations, 已查询出的对象按序列化器与主键缓存, 只序列化未命中的对象,
+版本号只能在对象查询后读取, 查询开始后变更过的对象不写入缓存
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+from utils.cache import version_key, dependency_tag, is_recent
+from utils.metrics import record_cache
+from utils.projection import project
+
+
+class Fragment:
+    def __init__(self, serializer_class, queryset, namespace, lookup_field='pk', timeout=None):
+        self.serializer_class = serializer_class
+        self.queryset = queryset
+        # 依赖命名空间, 如 'article' 对应 bump('article', uid)
+        self.namespace = namespace
+        self.lookup_field = lookup_field
+        self.timeout = settings.CACHE_TIME_FRAGMENT if timeout is None else timeout
+
+    def key(self, value):
+        return f'backend:fragment:{self.serializer_class.__name__}:{self.lookup_field}:{value}'
+
+    def version_key(self, pk):
+        return version_key(dependency_tag(self.namespace, pk))
+
+    def load_many(self, values):
+        """
+        查询未命中的对象, 返回 {查找值: 对象}
+        """
+        queryset = project(self.queryset, self.serializer_class)
+        prefetch_fields = getattr(self.serializer_class.Meta, 'prefetch_fields', ())
+        if prefetch_fields:
+            queryset = queryset.prefetch_related(*prefetch_fields)
+        lookup_field = self.queryset.model._meta.pk.name if self.lookup_field == 'pk' else self.lookup_field
+        return {getattr(obj, lookup_field): obj for obj in queryset.filter(**{f'{lookup_field}__in': values})}
+
+    def serialize(self, obj):
+        return self.serializer_class(obj).data
+
+
+def get_fragments(requests, cache=None):
+    """
+    requests: [(fragment, 查找值), ...]
+    按顺序返回序列化结果, 对象不存在时为 None
+    """
+    cache = caches[cache or 'default']
+    keys = [fragment.key(value) for fragment, value in requests]
+    # 按主键查找时版本号 key 已知, 与片段一起读取
+    known_version_keys = [fragment.version_key(value) for fragment, value in requests if fragment.lookup_field == 'pk']
+    values = cache.get_many([*keys, *known_version_keys])
+
+    entries = [values.get(key) for key in keys]
+    unknown_version_keys = [
+        request[0].version_key(entry['pk']) for request, entry in zip(requests, entries)
+        if entry is not None and request[0].version_key(entry['pk']) not in values
+    ]
+    if unknown_version_keys:
+        values.update(cache.get_many(unknown_version_keys))
+    # 以上版本号均在查询对象之前读取
+    read_version_keys = {*known_version_keys, *unknown_version_keys}
+
+    result = [None] * len(requests)
+    missing_map = {}
+    for index, ((fragment, value), entry) in enumerate(zip(requests, entries)):
+        if entry is not None and entry['version'] == values.get(fragment.version_key(entry['pk']), 0):
+            result[index] = entry['data']
+        else:
+            missing_map.setdefault(fragment, []).append((index, value))
+    record_cache('miss' if missing_map else 'hit')
+
+    for fragment, missing_list in missing_map.items():
+        started_at = time.time()
+        obj_map = fragment.load_many([value for _, value in missing_list])
+        unread_version_keys = [
+            fragment.version_key(obj.pk) for obj in obj_map.values()
+            if fragment.version_key(obj.pk) not in read_version_keys
+        ]
+        version_map = cache.get_many(unread_version_keys) if unread_version_keys else {}
+        new_entries = {}
+        for index, value in missing_list:
+            obj = obj_map.get(value)
+            if obj is None:
+                continue
+            result[index] = fragment.serialize(obj)
+            obj_version_key = fragment.version_key(obj.pk)
+            if obj_version_key in read_version_keys:
+                version = values.get(obj_version_key, 0)
+            else:
+                version = version_map.get(obj_version_key, 0)
+                if is_recent(version, started_at):
+                    continue
+            new_entries[fragment.key(value)] = {'pk': obj.pk, 'version': version, 'data': result[index]}
+        if new_entries:
+            cache.set_many(new_entries, fragment.timeout)
+    return result
+
+
+def representation_key(serializer, pk, variant=''):
+    return f'backend:fragment:{serializer.__class__.__name__}:{variant}:{pk}'
+
+
+def get_representations(serializer, instance_list, namespace, serialize_many, variant='', cache=None,
+                        loaded_at=None):
+    """
+    批量序列化, 一次 get_many 读取全部对象的序列化结果与版本号
+    未命中的对象交给 serialize_many(对象列表) 序列化, 按顺序返回结果, 并通过 set_many 写回
+    variant 区分同一序列化器的不同参数(如封面图尺寸)
+    loaded_at 为查询对象前的 time.time(), 版本号在对象查询之后读取, 查询期间变更过的对象不写入缓存;
+    未传入时以当前时间计, 只排除时钟误差范围内变更过的对象
+    """
+    loaded_at = time.time() if loaded_at is None else loaded_at
+    cache = caches[cache or 'default']
+    keys = [representation_key(serializer, obj.pk, variant) for obj in instance_list]
+    version_keys = [version_key(dependency_tag(namespace, obj.pk)) for obj in instance_list]
+    values = cache.get_many([*keys, *version_keys])
+
+    result = [None] * len(instance_list)
+    missing_list = []
+    for index, (key, version_key_) in enumerate(zip(keys, version_keys)):
+        entry = values.get(key)
+        if entry is not None and entry['version'] == values.get(version_key_, 0):
+            result[index] = entry['data']
+        else:
+            missing_list.append(index)
+    if instance_list:
+        record_cache('miss' if missing_list else 'hit')
+    if not missing_list:
+        return result
+
+    new_entries = {}
+    data_list = serialize_many([instance_list[index] for index in missing_list])
+    for index, data in zip(missing_list, data_list):
+        result[index] = data
+        version = values.get(version_keys[index], 0)
+        if not is_recent(version, loaded_at):
+            new_entries[keys[index]] = {'version': version, 'data': data}
+    if new_entries:
+        cache.set_many(new_entries, settings.CACHE_TIME_FRAGMENT)
+    return result
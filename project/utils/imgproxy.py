@@ -3,12 +3,15 @@ imgproxy
 获取图片处理管道地址
 
 imgproxy_url = imgproxy.get_img_url(img_path=obj.save_name, options=ImgProxyOptions.COVER_IMG)
+imgproxy_urls = imgproxy.get_img_urls(img_paths=[...], options=ImgProxyOptions.COVER_IMG)
 """
 
 import hmac
 import enum
 import base64
 import hashlib
+import threading
+from collections import OrderedDict
 
 from django.conf import settings
 
@@ -21,9 +24,13 @@ class ImgProxyOptions(enum.Enum):
 
 
 class ImgProxy:
-    def __init__(self, key, salt):
+    def __init__(self, key, salt, cache_size=10000):
         self._key = bytes.fromhex(key)
         self._salt = bytes.fromhex(salt)
+        # 签名结果 LRU 缓存, key 为 (img_path, options)
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
 
     def _get_signature(self, path):
         path = path.encode()
@@ -32,16 +39,47 @@ class ImgProxy:
         url = b'%s%s' % (signature, path)
         return url.decode()
 
-    def get_img_url(self, img_path, options: ImgProxyOptions = ImgProxyOptions.COVER_IMG):
+    def _sign_img_url(self, img_path, options):
         source_url = f'{img_path}'
         base64_path = base64.b64encode(source_url.encode('utf-8')).decode('utf-8')
         url_path = self._get_signature(path=f'{options.value}/{base64_path}')
         return f'{settings.PROJ_IMAGE_BASE_URL}{url_path}'
 
+    def get_img_urls(self, img_paths, options: ImgProxyOptions = ImgProxyOptions.COVER_IMG):
+        """
+        批量获取图片地址, 返回 {img_path: url}
+        """
+        img_urls = {}
+        missing_paths = []
+        with self._lock:
+            for img_path in img_paths:
+                key = (img_path, options)
+                url = self._cache.get(key)
+                if url is None:
+                    missing_paths.append(img_path)
+                else:
+                    self._cache.move_to_end(key)
+                    img_urls[img_path] = url
+        if not missing_paths:
+            return img_urls
+
+        signed_urls = {img_path: self._sign_img_url(img_path, options) for img_path in missing_paths}
+        with self._lock:
+            for img_path, url in signed_urls.items():
+                self._cache[(img_path, options)] = url
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        img_urls.update(signed_urls)
+        return img_urls
+
+    def get_img_url(self, img_path, options: ImgProxyOptions = ImgProxyOptions.COVER_IMG):
+        return self.get_img_urls([img_path], options=options)[img_path]
+
 
 imgproxy = ImgProxy(
     key=settings.IMGPROXY_KEY,
-    salt=settings.IMGPROXY_SALT
+    salt=settings.IMGPROXY_SALT,
+    cache_size=settings.IMGPROXY_CACHE_SIZE
 )
 
 if __name__ == '__main__':
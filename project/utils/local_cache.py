@@ -0,0 +1,87 @@
+"""
+进程内接口缓存
+
+位于 redis 之前的一级缓存, 只用于少数热点接口(cache_response(local=True)),
+命中时不访问 redis, 也不需要反序列化
+
+- 按 LRU 淘汰, 总大小不超过 LOCAL_CACHE_MAX_BYTES
+- 每条最多保留 LOCAL_CACHE_TIMEOUT 秒, 过期后回到 redis 重新校验依赖版本号
+- 本进程 bump() 时立即丢弃依赖该数据的条目, 其他进程最多延迟 LOCAL_CACHE_TIMEOUT 秒
+
+local_cache.stats() -> {'hit': ..., 'miss': ..., 'expired': ..., 'eviction': ..., 'entries': ..., 'bytes': ...}
+"""
+
+import time
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class LocalCache:
+    def __init__(self, max_bytes, timeout):
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        # key -> (过期时间, 大小, 接口缓存条目)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.counters = {'hit': 0, 'miss': 0, 'expired': 0, 'eviction': 0}
+
+    def get(self, key):
+        with self.lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.counters['miss'] += 1
+                return None
+            if item[0] <= time.monotonic():
+                self._remove(key)
+                self.counters['miss'] += 1
+                self.counters['expired'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters['hit'] += 1
+            return item[2]
+
+    def set(self, key, entry):
+        """
+        entry 为 utils.cache.CacheResponse 写入 redis 的条目, 不超过其软过期时间
+        """
+        # 整页缓存条目另有压缩内容, 见 utils.page_cache
+        size = len(entry['content']) + sum(len(content) for content in entry.get('variants', {}).values())
+        if size > self.max_bytes:
+            return
+        expires = time.monotonic() + min(self.timeout, entry['expires'] - time.time())
+        with self.lock:
+            self._remove(key)
+            self._entries[key] = (expires, size, entry)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.counters['eviction'] += 1
+
+    def discard_tags(self, tags):
+        """
+        丢弃依赖这些数据的条目, 见 utils.cache.bump
+        """
+        tags = set(tags)
+        with self.lock:
+            for key in [key for key, item in self._entries.items() if not tags.isdisjoint(item[2]['versions'])]:
+                self._remove(key)
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, 'entries': len(self._entries), 'bytes': self._bytes}
+
+    def _remove(self, key):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self._bytes -= item[1]
+
+
+local_cache = LocalCache(settings.LOCAL_CACHE_MAX_BYTES, settings.LOCAL_CACHE_TIMEOUT)
@@ -0,0 +1,122 @@
+"""
+进程内索引
+
+每个 worker 进程各自在内存中持有一份数据, 通过缓存中的版本号保持多进程一致:
+写入方增量更新本进程数据后调用 bump() 刷新版本号,
+其他进程在下次检查时发现版本变化, 在后台线程全量重建, 重建完成前继续使用旧数据
+只有首次使用(或 reset() 之后)在请求线程中同步构建
+
+build() 先构建完整的新数据, 最后在锁内整体替换, 读取方不会看到构建一半的数据
+
+版本号即依赖 tag 的版本号(见 utils.cache), 缓存视图使用索引时记录本进程数据的版本,
+本进程数据落后时不写入缓存, 索引更新后缓存失效
+"""
+
+import time
+import weakref
+import threading
+
+from django.db import connections
+
+from utils import cache as cache_utils
+from utils.logger import log
+
+
+class LocalIndex:
+    # 依赖 tag, 如 'index:search'
+    tag = None
+    # 版本检查间隔(秒), 间隔内直接使用本地数据
+    check_interval = 5
+    # 缓存视图记录使用的版本, 数据允许短暂落后时可关闭
+    observed = True
+    # 当前进程内的全部索引
+    instances = weakref.WeakSet()
+
+    def __init__(self):
+        LocalIndex.instances.add(self)
+        self.lock = threading.RLock()
+        self._version = None
+        self._checked_at = None
+        self._rebuilding = False
+
+    @property
+    def loaded(self):
+        return self._checked_at is not None
+
+    def build(self):
+        """
+        全量构建, 由子类实现, 构建完成后在 self.lock 内替换数据
+        """
+        raise NotImplementedError
+
+    def get_version(self):
+        return cache_utils.get_versions([self.tag])[self.tag]
+
+    def ensure(self):
+        """
+        检查版本, 未加载时同步构建, 版本变化时后台重建
+        """
+        now = time.monotonic()
+        if not self.loaded:
+            with self.lock:
+                if not self.loaded:
+                    version = self.get_version()
+                    self.build()
+                    self._version = version
+                    self._checked_at = now
+        elif now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            if self.get_version() != self._version:
+                self.start_rebuild()
+        if self.observed:
+            cache_utils.observe(self.tag, self._version)
+
+    def start_rebuild(self):
+        """
+        在后台线程重建, 同一时间只有一个
+        """
+        with self.lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self.rebuild, name=f'{type(self).__name__}-rebuild', daemon=True).start()
+
+    def rebuild(self):
+        try:
+            # 构建前读取版本号, 构建期间的变更由下次检查发现
+            version = self.get_version()
+            self.build()
+            with self.lock:
+                self._version = version
+        except Exception as e:
+            log.exception(e)
+        finally:
+            self._rebuilding = False
+            # 线程内打开的数据库连接不会被请求结束时关闭
+            connections.close_all()
+
+    def bump(self):
+        """
+        本进程数据已是最新, 刷新版本号通知其他进程
+        """
+        version = cache_utils.bump(self.tag)
+        with self.lock:
+            self._version = version
+
+    def invalidate(self):
+        """
+        数据已变更但本进程未增量更新, 刷新版本号, 本进程与其他进程一样在后台重建
+        """
+        cache_utils.bump(self.tag)
+        with self.lock:
+            if self.loaded:
+                # 下次使用时立即检查版本
+                self._checked_at = time.monotonic() - self.check_interval
+
+    def reset(self):
+        """
+        丢弃本进程数据, 下次使用时同步构建, 并通知其他进程重建
+        """
+        with self.lock:
+            self._checked_at = None
+        self.bump()
@@ -0,0 +1,185 @@
+"""
+接口性能统计
+
+MetricsMiddleware 按路由记录每个请求的:
+- wall: 总耗时(ms)
+- db: SQL 耗时(ms)
+- queries: SQL 数量
+- serializer: 序列化耗时(ms)
+- cache: 接口缓存命中情况 hit / stale / miss
+
+数据保存在当前进程内, 按分钟滚动, 保留最近 METRICS_WINDOW_COUNT 分钟的分桶直方图
+metrics.snapshot() -> {'pid': ..., 'view_list': [{'route': 'api/v1/article/page/index', 'wall': {...}, ...}]}
+"""
+
+import os
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from contextlib import contextmanager
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+# 分桶上界, 毫秒与 SQL 数量共用
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+WINDOW_SECONDS = 60
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    单个请求的统计
+    """
+
+    def __init__(self):
+        self.db_time = 0
+        self.query_count = 0
+        self.serializer_time = 0
+        self.cache_status = None
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper
+        started_at = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started_at
+            self.query_count += 1
+
+
+class RollingHistogram:
+    """
+    按分钟滚动的分桶直方图
+    """
+
+    def __init__(self):
+        self.windows = {}
+
+    def add(self, value, window):
+        counts = self.windows.get(window)
+        if counts is None:
+            counts = self.windows[window] = [0] * (len(BUCKETS) + 1)
+            for expired_window in [w for w in self.windows if w <= window - settings.METRICS_WINDOW_COUNT]:
+                del self.windows[expired_window]
+        counts[bisect_left(BUCKETS, value)] += 1
+
+    def summary(self, window):
+        counts = [0] * (len(BUCKETS) + 1)
+        for w, window_counts in self.windows.items():
+            if w > window - settings.METRICS_WINDOW_COUNT:
+                counts = [a + b for a, b in zip(counts, window_counts)]
+        total = sum(counts)
+        return {
+            'count': total,
+            'p50': self.percentile(counts, total, 0.5),
+            'p95': self.percentile(counts, total, 0.95),
+            'p99': self.percentile(counts, total, 0.99),
+        }
+
+    @staticmethod
+    def percentile(counts, total, q):
+        """
+        返回所在分桶上界, 超出最大分桶返回 None
+        """
+        if not total:
+            return 0
+        cumulative = 0
+        for index, count in enumerate(counts):
+            cumulative += count
+            if cumulative >= total * q:
+                return BUCKETS[index] if index < len(BUCKETS) else None
+        return None
+
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = defaultdict(lambda: defaultdict(RollingHistogram))
+        self.counters = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+
+    def record(self, route, wall_time, request_metrics):
+        window = int(time.time() // WINDOW_SECONDS)
+        with self.lock:
+            histograms = self.histograms[route]
+            histograms['wall'].add(wall_time * 1000, window)
+            histograms['db'].add(request_metrics.db_time * 1000, window)
+            histograms['queries'].add(request_metrics.query_count, window)
+            histograms['serializer'].add(request_metrics.serializer_time * 1000, window)
+            counters = self.counters[route][window]
+            counters[request_metrics.cache_status or 'uncached'] += 1
+            for expired_window in [w for w in self.counters[route] if w <= window - settings.METRICS_WINDOW_COUNT]:
+                del self.counters[route][expired_window]
+
+    def snapshot(self):
+        window = int(time.time() // WINDOW_SECONDS)
+        view_list = []
+        with self.lock:
+            for route, histograms in self.histograms.items():
+                cache_counts = defaultdict(int)
+                for w, counters in self.counters[route].items():
+                    if w > window - settings.METRICS_WINDOW_COUNT:
+                        for status, count in counters.items():
+                            cache_counts[status] += count
+                cached_total = cache_counts['hit'] + cache_counts['stale'] + cache_counts['miss']
+                view_list.append({
+                    'route': route,
+                    **{name: histogram.summary(window) for name, histogram in histograms.items()},
+                    'cache': dict(cache_counts),
+                    'cache_hit_ratio': (cache_counts['hit'] + cache_counts['stale']) / cached_total
+                    if cached_total else None,
+                })
+        return {'pid': os.getpid(), 'window_minutes': settings.METRICS_WINDOW_COUNT, 'view_list': view_list}
+
+
+metrics = Metrics()
+
+
+def record_cache(status):
+    """
+    记录接口缓存命中情况, 见 utils.cache
+    """
+    request_metrics = _current.get()
+    if request_metrics is not None:
+        request_metrics.cache_status = status
+
+
+@contextmanager
+def serializer_timer():
+    """
+    记录序列化耗时
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        request_metrics = _current.get()
+        if request_metrics is not None:
+            request_metrics.serializer_time += time.perf_counter() - started_at
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        request_metrics = RequestMetrics()
+        token = _current.set(request_metrics)
+        started_at = time.perf_counter()
+        try:
+            with connection.execute_wrapper(request_metrics):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        resolver_match = getattr(request, 'resolver_match', None)
+        # 整页缓存命中时未经过 URL 解析, 见 utils.page_cache
+        route = resolver_match.route if resolver_match is not None else getattr(request, 'cache_route', None)
+        if route is not None:
+            metrics.record(route, time.perf_counter() - started_at, request_metrics)
+        return response
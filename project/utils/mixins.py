@@ -4,6 +4,7 @@ Mixin 合集
 from rest_framework import status
 from rest_framework.settings import api_settings
 
+from utils.projection import project
 from utils.response import APIResponse
 
 
@@ -35,7 +36,7 @@ class ListModelMixin:
     """
 
     def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
+        queryset = project(self.filter_queryset(self.get_queryset()), self.get_serializer_class())
 
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -0,0 +1,154 @@
+"""
+整页缓存
+
+PageCacheMiddleware 位于中间件前部, 按请求路径(含查询参数)缓存最终响应字节,
+命中时不经过 URL 解析、DRF 与后续中间件, 未命中时交给视图处理
+
+只缓存 cache_response(early=True) 的视图, 这类视图的响应只由 URL 决定, 不能需要鉴权:
+视图返回的响应带有 page_cache 标记(依赖版本号与软过期时间), 中间件据此写入
+
+- 读取一次 redis 取得条目, 再一次 get_many 校验依赖版本号
+- cache_response(local=True) 的视图同时使用进程内缓存, 见 utils.local_cache
+- 条目同时保存 gzip 压缩后的内容, 按 Accept-Encoding 直接返回
+  brotli 不在项目依赖中, 仅当运行环境另行安装时额外保存 br 压缩内容
+- 按内容生成 ETag, If-None-Match 一致时返回 304
+- Cache-Control 的 max-age 为条目剩余的软过期时间, 即各接口的 CACHE_TIME_*
+"""
+
+import gzip
+import time
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http.response import HttpResponse, HttpResponseNotModified
+
+from utils.cache import get_versions, is_cache_bypassed
+from utils.metrics import record_cache
+from utils.local_cache import local_cache
+
+# 可选, 未安装时只使用 gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 不随条目保存的响应头, 返回时重新计算
+SKIP_HEADERS = {'content-length', 'content-encoding', 'etag', 'cache-control', 'vary'}
+# 按优先级排列的压缩方式
+ENCODINGS = ('br', 'gzip')
+# 每个条目只压缩一次, 取压缩率较高的级别
+BROTLI_QUALITY = 9
+
+
+def page_key(request):
+    return f'backend:page:{hashlib.md5(request.get_full_path().encode()).hexdigest()}'
+
+
+def compress(content):
+    """
+    返回 {压缩方式: 压缩后内容}, 内容较短时不压缩
+    """
+    if len(content) < settings.PAGE_CACHE_GZIP_MIN_LENGTH:
+        return {}
+    variants = {'gzip': gzip.compress(content, mtime=0)}
+    if brotli is not None:
+        variants['br'] = brotli.compress(content, quality=BROTLI_QUALITY)
+    return variants
+
+
+def get_encoding(request, variants):
+    accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+    for encoding in ENCODINGS:
+        if encoding in variants and encoding in accept_encoding:
+            return encoding
+    return None
+
+
+def is_not_modified(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == '*' or etag in [value.strip() for value in if_none_match.split(',')]
+
+
+class PageCacheMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cache = caches['default']
+
+    def __call__(self, request):
+        if not settings.PAGE_CACHE_ENABLED or request.method != 'GET' or is_cache_bypassed():
+            return self.get_response(request)
+
+        key = page_key(request)
+        entry = self.get_entry(key)
+        if entry is not None:
+            record_cache('hit')
+            # 供 MetricsMiddleware 按路由统计
+            request.cache_route = entry['route']
+            return self.build_response(entry, request)
+
+        response = self.get_response(request)
+        page_cache = getattr(response, 'page_cache', None)
+        if page_cache is not None and response.status_code == 200 and not response.streaming:
+            entry = self.set_entry(key, request, response, page_cache)
+            if entry is not None:
+                # 首次请求同样返回压缩内容与校验头
+                return self.build_response(entry, request)
+        return response
+
+    def get_entry(self, key):
+        entry = local_cache.get(key)
+        if entry is not None:
+            return entry
+        entry = self.cache.get(key)
+        if entry is None or entry['expires'] <= time.time():
+            return None
+        if get_versions(entry['versions'], self.cache) != entry['versions']:
+            return None
+        if entry['local']:
+            local_cache.set(key, entry)
+        return entry
+
+    def set_entry(self, key, request, response, page_cache):
+        timeout = int(page_cache['expires'] - time.time())
+        if timeout <= 0:
+            return None
+        content = response.content
+        entry = {
+            'route': request.resolver_match.route,
+            'content': content,
+            'variants': compress(content),
+            'etag': f'W/"{hashlib.md5(content).hexdigest()}"',
+            'status': response.status_code,
+            'headers': {header: value for header, value in response.items() if header.lower() not in SKIP_HEADERS},
+            'vary': response.get('Vary'),
+            **page_cache,
+        }
+        self.cache.set(key, entry, timeout)
+        if entry['local']:
+            local_cache.set(key, entry)
+        return entry
+
+    def build_response(self, entry, request):
+        if is_not_modified(request, entry['etag']):
+            response = HttpResponseNotModified()
+        else:
+            encoding = get_encoding(request, entry['variants'])
+            if encoding is None:
+                response = HttpResponse(content=entry['content'], status=entry['status'])
+            else:
+                response = HttpResponse(content=entry['variants'][encoding], status=entry['status'])
+                response['Content-Encoding'] = encoding
+            for header, value in entry['headers'].items():
+                response[header] = value
+            response['Content-Length'] = len(response.content)
+        response['ETag'] = entry['etag']
+        response['Cache-Control'] = f'public, max-age={max(int(entry["expires"] - time.time()), 0)}'
+        vary = [entry['vary']] if entry['vary'] else []
+        if entry['variants']:
+            vary.append('Accept-Encoding')
+        if vary:
+            response['Vary'] = ', '.join(vary)
+        return response
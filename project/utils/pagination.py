@@ -2,12 +2,74 @@
 重写 DRF Paginator
 """
 
+import json
+import base64
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError, EmptyResultSet
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
 from rest_framework import status as drf_status
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
 
+from utils.cache import get_versions
 from utils.response import APIResponse
 
 
+def get_cached_count(queryset, deps, cap=0):
+    """
+    查询集总数, 以去掉排序后的 SQL 与依赖版本号为 key 缓存, 同一查询的各页共用
+    cap 大于 0 时最多计数到 cap + 1
+    """
+    queryset = queryset.order_by()
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    versions = get_versions(deps)
+    signature = hashlib.md5(f'{sql}:{params}:{cap}'.encode()).hexdigest()
+    key = f'backend:count:{signature}:' + ':'.join(str(versions[tag]) for tag in deps)
+    count = cache.get(key)
+    if count is None:
+        count = queryset[:cap + 1].count() if cap else queryset.count()
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class CachedCountPaginator(DjangoPaginator):
+    """
+    总数缓存 Paginator
+
+    count_cache_deps 为空时与 Django Paginator 相同
+    count_cap 大于 0 时总数超出 count_cap 只返回 count_cap, display_count 为 "10000+"
+    """
+
+    def __init__(self, *args, count_cache_deps=(), count_cap=0, **kwargs):
+        self.count_cache_deps = count_cache_deps
+        self.count_cap = count_cap
+        super().__init__(*args, **kwargs)
+
+    @cached_property
+    def raw_count(self):
+        if not self.count_cache_deps or not isinstance(self.object_list, QuerySet):
+            return super().count
+        return get_cached_count(self.object_list, self.count_cache_deps, self.count_cap)
+
+    @cached_property
+    def count(self):
+        return min(self.raw_count, self.count_cap) if self.count_cap else self.raw_count
+
+    @property
+    def display_count(self):
+        if self.count_cap and self.raw_count > self.count_cap:
+            return f'{self.count_cap}+'
+        return self.count
+
+
 class APIPageNumberPagination(PageNumberPagination):
     """
     分页 Page Number Paginator
@@ -20,6 +82,164 @@ class APIPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'size'
     # 自定义翻页 字段
     page_query_param = 'page'
+    # 总数缓存依赖, 为空时不缓存
+    count_cache_deps = ()
+    # 总数上限, 0 为精确计数
+    count_cap = 0
+
+    def django_paginator_class(self, object_list, per_page):
+        return CachedCountPaginator(object_list, per_page, count_cache_deps=self.count_cache_deps,
+                                    count_cap=self.count_cap)
+
+    def get_paginated_response(self, data):
+        return APIResponse(
+            data=data,
+            status=drf_status.HTTP_200_OK,
+            msg='ok',
+            next=self.get_next_link(),
+            previous=self.get_previous_link(),
+            count=self.page.paginator.display_count
+        )
+
+
+class CatalogPageNumberPagination(APIPageNumberPagination):
+    """
+    文章列表分页, 总数缓存在文章写入后失效
+    """
+    count_cache_deps = ('catalog',)
+    count_cap = settings.PAGINATION_COUNT_CAP
+
+
+class APICursorPagination(BasePagination):
+    """
+    游标分页 Cursor Paginator
+
+    按 (排序字段, uid) 定位下一页, 不使用 OFFSET, 默认不查询总数
+    - 第一页传 cursor= , 之后使用返回的 next / previous 链接
+    - count=1 时返回总数
+    - 查询集只查询排序字段与 uid, 分页结果为 uid 列表, 由调用方查询文章
+    - 已排序的 uid 列表(如搜索结果)按 (位置, uid) 定位, 列表变化时以 uid 为准
+    """
+    page_size = 24
+    max_page_size = 200
+    page_size_query_param = 'size'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    # 排序字段, 最后一个字段须唯一
+    ordering = ('-update_time', '-uid')
+    count_cache_deps = ('catalog',)
+
+    @classmethod
+    def is_requested(cls, request):
+        return cls.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.next_cursor = None
+        self.previous_cursor = None
+        self.count = None
+        try:
+            cursor = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+            if isinstance(queryset, (list, tuple)):
+                return self.paginate_list(queryset, cursor)
+            return self.paginate_keyset(queryset, cursor)
+        except (TypeError, ValueError, ValidationError):
+            # 游标无效
+            return None
+
+    def paginate_list(self, uid_list, cursor):
+        position = 0
+        reverse = False
+        if cursor is not None:
+            reverse, (position, uid) = cursor
+            position = int(position)
+            if not 0 <= position < len(uid_list) or uid_list[position] != uid:
+                position = uid_list.index(uid) if uid in uid_list else min(max(position, 0), len(uid_list))
+
+        if reverse:
+            start, end = max(0, position - self.page_size), position
+        else:
+            start, end = position, position + self.page_size
+        if end < len(uid_list):
+            self.next_cursor = (False, [end, uid_list[end]])
+        if 0 < start < len(uid_list):
+            self.previous_cursor = (True, [start, uid_list[start]])
+        self.count = len(uid_list)
+        return list(uid_list[start:end])
+
+    def paginate_keyset(self, queryset, cursor):
+        if self.request.query_params.get(self.count_query_param):
+            self.count = get_cached_count(queryset, self.count_cache_deps)
+
+        reverse = cursor is not None and cursor[0]
+        ordering = [self.flip(field) if reverse else field for field in self.ordering]
+        field_names = [field.lstrip('-') for field in self.ordering]
+        queryset = queryset.order_by(*ordering).values_list(*field_names)
+        if cursor is not None:
+            if len(cursor[1]) != len(field_names):
+                raise ValueError(cursor)
+            values = [queryset.model._meta.get_field(name).to_python(value)
+                      for name, value in zip(field_names, cursor[1])]
+            queryset = queryset.filter(self.get_keyset_filter(ordering, values))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        has_next, has_previous = (True, has_more) if reverse else (has_more, cursor is not None)
+        if rows and has_next:
+            self.next_cursor = (False, list(rows[-1]))
+        if rows and has_previous:
+            self.previous_cursor = (True, list(rows[0]))
+        return [row[-1] for row in rows]
+
+    @staticmethod
+    def flip(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def get_keyset_filter(ordering, values):
+        """
+        (a, b) 排在游标之后: a 在其后, 或 a 相等且 b 在其后
+        """
+        keyset_filter = Q()
+        for index, field in enumerate(ordering):
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = Q(**{f'{field.lstrip("-")}__{lookup}': values[index]})
+            for previous_field, value in zip(ordering[:index], values):
+                condition &= Q(**{previous_field.lstrip('-'): value})
+            keyset_filter |= condition
+        return keyset_filter
+
+    def encode_cursor(self, cursor):
+        content = json.dumps([int(cursor[0]), *cursor[1]], default=lambda value: value.isoformat())
+        return base64.urlsafe_b64encode(content.encode()).decode()
+
+    def decode_cursor(self, token):
+        if not token:
+            return None
+        reverse, *values = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+        return bool(reverse), values
+
+    def get_page_size(self, request):
+        try:
+            return min(max(int(request.query_params[self.page_size_query_param]), 1), self.max_page_size)
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(cursor))
+
+    def get_next_link(self):
+        return self.get_link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self.get_link(self.previous_cursor)
 
     def get_paginated_response(self, data):
         return APIResponse(
@@ -28,5 +248,5 @@ class APIPageNumberPagination(PageNumberPagination):
             msg='ok',
             next=self.get_next_link(),
             previous=self.get_previous_link(),
-            count=self.page.paginator.count
+            count=self.count
         )
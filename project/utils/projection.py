@@ -0,0 +1,85 @@
+"""
+按序列化器字段只查询用到的列
+
+    queryset = project(Article.objects.all(), ArticleSimpleSerializer)
+    # -> Article.objects.only('uid', 'slug', 'title', 'cover_img', 'rank')
+
+字段推导:
+- 普通字段按 source 取模型字段
+- SerializerMethodField 取同名模型字段(如 get_cover_img 读取 cover_img)
+- 多对多字段不需要列, 由预取处理
+- 无法推导(source='*' 等)时不做处理
+
+方法字段读取了其他列时, 在 Meta.only_fields 中显式指定全部字段, 为 None 时不做处理
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from django.db.models.query import ModelIterable
+from rest_framework import serializers
+
+_only_fields_map = {}
+
+
+def get_model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def derive_only_fields(serializer_class):
+    meta = getattr(serializer_class, 'Meta', None)
+    model = getattr(meta, 'model', None)
+    if model is None:
+        return None
+    if hasattr(meta, 'only_fields'):
+        return tuple(meta.only_fields) if meta.only_fields is not None else None
+
+    only_fields = [model._meta.pk.name]
+    for field_name, field in serializer_class().fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            source = field_name
+        elif field.source == '*':
+            return None
+        else:
+            source = field.source.split('.')[0]
+        model_field = get_model_field(model, source)
+        if model_field is None:
+            if isinstance(field, serializers.SerializerMethodField):
+                continue
+            # 属性或方法, 无法确定读取了哪些列
+            return None
+        if model_field.many_to_many or model_field.one_to_many:
+            continue
+        if not model_field.concrete:
+            return None
+        if model_field.name not in only_fields:
+            only_fields.append(model_field.name)
+    return tuple(only_fields)
+
+
+def get_only_fields(serializer_class):
+    """
+    序列化器用到的模型字段, 无法确定时返回 None
+    """
+    if serializer_class not in _only_fields_map:
+        _only_fields_map[serializer_class] = derive_only_fields(serializer_class)
+    return _only_fields_map[serializer_class]
+
+
+def project(queryset, serializer_class):
+    """
+    查询集只查询序列化器用到的列, 查询集不是该模型的实例查询时原样返回
+    """
+    if not isinstance(queryset, QuerySet) or queryset._iterable_class is not ModelIterable:
+        return queryset
+    meta = getattr(serializer_class, 'Meta', None)
+    if getattr(meta, 'model', None) is not queryset.model:
+        return queryset
+    only_fields = get_only_fields(serializer_class)
+    if only_fields is None:
+        return queryset
+    return queryset.only(*only_fields)
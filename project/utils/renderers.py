@@ -0,0 +1,102 @@
+"""
+JSON 渲染
+
+替代 djangorestframework_camel_case 的 CamelCaseJSONRenderer, 输出逐字节一致:
+- 键名转换结果按键名缓存, 序列化器字段固定, 每个键只做一次正则替换
+- 安装了 orjson 时用 orjson 直接输出 bytes, 否则使用标准库 json
+- orjson 与标准库输出可能不一致的数据(超出范围的浮点数、非字符串键、超大整数等)回退到 DRF JSONRenderer
+"""
+
+import re
+import decimal
+
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+from djangorestframework_camel_case.util import camelize_re, underscore_to_camel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 键名转换缓存数量上限, 超出后不再缓存(如以数据为键的字典)
+KEY_CACHE_SIZE = 10000
+# 标准库 repr 在此范围外使用科学计数法, 与 orjson 格式不同
+FLOAT_RANGE = (1e-4, 1e16)
+
+_key_map = {}
+
+
+def camelize_key(key):
+    camel_key = _key_map.get(key)
+    if camel_key is None:
+        camel_key = re.sub(camelize_re, underscore_to_camel, key) if '_' in key else key
+        if len(_key_map) < KEY_CACHE_SIZE:
+            _key_map[key] = camel_key
+    return camel_key
+
+
+class Camelizer:
+    """
+    与 djangorestframework_camel_case.util.camelize 结果相同, 同时记录能否使用 orjson
+    """
+
+    def __init__(self):
+        self.orjson_safe = True
+
+    def camelize(self, data):
+        if isinstance(data, str):
+            return data
+        if isinstance(data, dict):
+            result = {}
+            for key, value in data.items():
+                if isinstance(key, Promise):
+                    key = force_str(key)
+                if isinstance(key, str):
+                    key = camelize_key(key)
+                else:
+                    self.orjson_safe = False
+                result[key] = self.camelize(value)
+            return result
+        if isinstance(data, (list, tuple)):
+            return [self.camelize(item) for item in data]
+        if data is None or isinstance(data, int):
+            return data
+        if isinstance(data, float):
+            if data != 0 and not FLOAT_RANGE[0] <= abs(data) < FLOAT_RANGE[1]:
+                # 含 nan / inf
+                self.orjson_safe = False
+            return data
+        if isinstance(data, Promise):
+            return force_str(data)
+        if isinstance(data, decimal.Decimal):
+            # DRF JSONEncoder 转为 float 输出
+            self.orjson_safe = False
+            return data
+        try:
+            iterator = iter(data)
+        except TypeError:
+            return data
+        return [self.camelize(item) for item in iterator]
+
+
+class CamelCaseJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        camelizer = Camelizer()
+        data = camelizer.camelize(data)
+
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if (orjson is None or not camelizer.orjson_safe or indent is not None
+                or self.ensure_ascii or not self.compact or not self.strict):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            # 日期时间交给 DRF JSONEncoder, 格式与 DRF 一致
+            content = orjson.dumps(data, default=self.encoder_class().default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # 与 DRF 相同, 转义 JavaScript 中非法的 U+2028 / U+2029
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')